@@ -2,26 +2,28 @@ import streamlit as st
 import json
 import uuid
 import random
+import secrets
 import string
-from datetime import datetime
+from datetime import datetime, timedelta
 import sqlite3
 import base64
 from io import BytesIO
 import time
-from PIL import Image
 import os
 from pathlib import Path
+import logging
+import threading
+import functools
+import contextlib
+import html
+import shutil
+import zlib
+from collections import deque, OrderedDict
 
-# Configuração da página
-st.set_page_config(
-    page_title="Kanban App!",
-    page_icon="📋",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # CSS Customizado
-st.markdown("""
+PAGE_CSS = """
 <style>
     .stApp {
         background-color: #F5F5F5;
@@ -61,15 +63,84 @@ st.markdown("""
         margin-bottom: 8px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Ajustes de layout (espaçamentos, menu e footer do Streamlit)
+LAYOUT_CSS = """
+<style>
+    .main {
+        background-color: #ffffff;
+        color: #333333;
+    }
+    .block-container {
+        padding-top: 1rem;
+        padding-bottom: 0rem;
+    }
+    /* Esconde o menu principal e footer, MAS mantém o botão do sidebar */
+    #MainMenu {visibility: hidden !important;}
+    footer {visibility: hidden !important;}
+    
+    /* Mantém o botão de toggle do sidebar visível */
+    button[kind="header"] {
+        display: block !important;
+        visibility: visible !important;
+    }
+    
+    /* Remove qualquer espaço em branco adicional */
+    div[data-testid="stAppViewBlockContainer"] {
+        padding-top: 0 !important;
+        padding-bottom: 0 !important;
+    }
+    div[data-testid="stVerticalBlock"] {
+        gap: 0 !important;
+        padding-top: 0 !important;
+        padding-bottom: 0 !important;
+    }
+    /* Remove quaisquer margens extras */
+    .element-container {
+        margin-top: 0 !important;
+        margin-bottom: 0 !important;
+    }
+    
+    /* Garante que o header com o botão do sidebar fique visível */
+    header[data-testid="stHeader"] {
+        display: block !important;
+        visibility: visible !important;
+        background-color: transparent !important;
+    }
+</style>
+"""
+
+def minify_css(css):
+    """Remove indentação e linhas vazias do CSS"""
+    return "".join(line.strip() for line in css.splitlines())
+
+# Todo o CSS em um único bloco, montado uma vez na importação do módulo
+APP_CSS = (minify_css(PAGE_CSS) + minify_css(LAYOUT_CSS)).replace("</style><style>", "")
+
+def setup_page():
+    """Configuração da página e CSS customizado"""
+    st.set_page_config(
+        page_title="Kanban App!",
+        page_icon="📋",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # =============================================================================
 # FUNÇÕES AUXILIARES
 # =============================================================================
 
 def generate_project_code():
-    """Gera código alfanumérico único de 8 dígitos"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    """Gera código alfanumérico aleatório de 8 dígitos (unicidade garantida pelo banco na alocação)"""
+    alphabet = string.ascii_uppercase + string.digits
+    return ''.join(secrets.choice(alphabet) for _ in range(8))
+
+def chunked(items, size):
+    """Divide uma lista em blocos (limite de parâmetros por consulta do SQLite)"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 def format_datetime(dt_string):
     """Formata datetime para DD/MM HH:MM"""
@@ -79,6 +150,70 @@ def format_datetime(dt_string):
     except:
         return dt_string
 
+# Espaçamento entre posições consecutivas de uma coluna
+RANK_GAP = 1024.0
+
+def rank_between(before, after):
+    """Calcula posição entre duas vizinhas (None indica extremidade da coluna)"""
+    if before is None and after is None:
+        return RANK_GAP
+    if before is None:
+        return after - RANK_GAP
+    if after is None:
+        return before + RANK_GAP
+    return (before + after) / 2
+
+def column_tasks_sorted(tasks, column):
+    """Retorna tarefas de uma coluna ordenadas pela posição"""
+    col_tasks = [t for t in tasks if t['column'] == column]
+    col_tasks.sort(key=lambda t: t['rank'] if t.get('rank') is not None else float('inf'))
+    return col_tasks
+
+def assign_missing_ranks(tasks):
+    """Atribui posição às tarefas sem rank (dados antigos ou JSON importado)"""
+    last_rank = {}
+    for task in tasks:
+        if task.get('rank') is not None:
+            last_rank[task['column']] = max(last_rank.get(task['column'], task['rank']), task['rank'])
+    for task in tasks:
+        if task.get('rank') is None:
+            task['rank'] = rank_between(last_rank.get(task['column']), None)
+            last_rank[task['column']] = task['rank']
+
+def move_task_in_column(tasks, task, direction):
+    """Reposiciona tarefa na coluna ('up', 'down' ou 'top') alterando apenas seu rank.
+    
+    Retorna a lista de tarefas alteradas (vazia se a tarefa já está na
+    extremidade). Normalmente só a própria tarefa muda; quando o espaço entre
+    vizinhas se esgota, a coluna inteira é renumerada.
+    """
+    col_tasks = column_tasks_sorted(tasks, task['column'])
+    idx = col_tasks.index(task)
+    others = [t for t in col_tasks if t is not task]
+    
+    if direction == 'top':
+        target = 0
+    elif direction == 'up':
+        target = idx - 1
+    else:
+        target = idx + 1
+    if target < 0 or target >= len(col_tasks) or target == idx:
+        return []
+    
+    before = others[target - 1]['rank'] if target > 0 else None
+    after = others[target]['rank'] if target < len(others) else None
+    new_rank = rank_between(before, after)
+    
+    if new_rank in (before, after):
+        # Precisão esgotada: renumera a coluna inteira com espaçamento padrão
+        others.insert(target, task)
+        for pos, t in enumerate(others):
+            t['rank'] = (pos + 1) * RANK_GAP
+        return others
+    
+    task['rank'] = new_rank
+    return [task]
+
 def get_admin_password():
     """Obtém senha de administrador do ambiente ou usa padrão"""
     return os.getenv('ADMIN_PASSWORD', 'admin123')
@@ -89,25 +224,477 @@ def image_to_base64(image):
     image.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode()
 
+def base64_to_bytes(base64_string):
+    """Decodifica base64 (com ou sem prefixo data:) para bytes"""
+    try:
+        return base64.b64decode(base64_string.split(',')[1] if ',' in base64_string else base64_string)
+    except:
+        return None
+
 def base64_to_image(base64_string):
     """Converte base64 para imagem PIL"""
+    # PIL só é carregado quando há logo para processar
+    from PIL import Image
+    
+    image_data = base64_to_bytes(base64_string)
+    if image_data is None:
+        return None
     try:
-        image_data = base64.b64decode(base64_string.split(',')[1] if ',' in base64_string else base64_string)
         return Image.open(BytesIO(image_data))
     except:
         return None
 
+# =============================================================================
+# TELEMETRIA
+# =============================================================================
+
+logger = logging.getLogger("kanban_app")
+
+# Operações acima deste tempo (ms) são registradas no log como lentas
+SLOW_OPERATION_MS = float(os.getenv('KANBAN_SLOW_MS', '500'))
+# Arquivo onde as métricas são gravadas em formato texto do Prometheus
+METRICS_FILE = os.getenv('KANBAN_METRICS_FILE', 'kanban_metrics.prom')
+# Intervalo mínimo (s) entre gravações automáticas do arquivo de métricas (0 desativa)
+METRICS_DUMP_INTERVAL = float(os.getenv('KANBAN_METRICS_INTERVAL', '0'))
+# Quantidade de amostras mantidas por operação para cálculo dos percentis
+METRICS_WINDOW = 1000
+
+class Telemetry:
+    """Coleta de latência, linhas e tamanho de payload por operação"""
+    
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.counters = {}
+        self.last_dump = 0.0
+    
+    def _counter(self, operation):
+        if operation not in self.counters:
+            self.counters[operation] = {
+                'count': 0, 'errors': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0
+            }
+            self.samples[operation] = deque(maxlen=self.window)
+        return self.counters[operation]
+    
+    def record(self, operation, seconds, rows=None, payload_bytes=None):
+        """Registra uma execução da operação"""
+        with self.lock:
+            counter = self._counter(operation)
+            counter['count'] += 1
+            counter['seconds'] += seconds
+            counter['rows'] += rows or 0
+            counter['bytes'] += payload_bytes or 0
+            self.samples[operation].append(seconds)
+        
+        if seconds * 1000 > SLOW_OPERATION_MS:
+            logger.warning(
+                "Operação lenta: %s levou %.1f ms (linhas=%s, bytes=%s)",
+                operation, seconds * 1000, rows, payload_bytes
+            )
+    
+    def record_error(self, operation):
+        """Registra uma falha da operação"""
+        with self.lock:
+            self._counter(operation)['errors'] += 1
+    
+    def snapshot(self):
+        """Retorna resumo por operação com percentis da janela recente"""
+        with self.lock:
+            items = [(op, dict(c), sorted(self.samples[op])) for op, c in self.counters.items()]
+        
+        summary = []
+        for operation, counter, ordered in sorted(items):
+            def percentile(q):
+                if not ordered:
+                    return 0.0
+                return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            
+            summary.append({
+                'operation': operation,
+                'count': counter['count'],
+                'errors': counter['errors'],
+                'p50_ms': percentile(0.50) * 1000,
+                'p95_ms': percentile(0.95) * 1000,
+                'p99_ms': percentile(0.99) * 1000,
+                'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+                'seconds': counter['seconds'],
+                'rows': counter['rows'],
+                'bytes': counter['bytes']
+            })
+        return summary
+    
+    def to_prometheus(self):
+        """Formata métricas no formato texto do Prometheus"""
+        summary = self.snapshot()
+        lines = [
+            "# HELP kanban_operation_duration_seconds Latência por operação",
+            "# TYPE kanban_operation_duration_seconds summary"
+        ]
+        for item in summary:
+            label = f'operation="{item["operation"]}"'
+            for quantile, key in (("0.5", 'p50_ms'), ("0.95", 'p95_ms'), ("0.99", 'p99_ms')):
+                lines.append(f'kanban_operation_duration_seconds{{{label},quantile="{quantile}"}} {item[key] / 1000:.6f}')
+            lines.append(f"kanban_operation_duration_seconds_sum{{{label}}} {item['seconds']:.6f}")
+            lines.append(f"kanban_operation_duration_seconds_count{{{label}}} {item['count']}")
+        
+        for name, key, help_text in (
+            ("kanban_operation_errors_total", 'errors', "Falhas por operação"),
+            ("kanban_operation_rows_total", 'rows', "Linhas processadas por operação"),
+            ("kanban_operation_payload_bytes_total", 'bytes', "Bytes de payload por operação")
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for item in summary:
+                lines.append(f'{name}{{operation="{item["operation"]}"}} {item[key]}')
+        
+        return "\n".join(lines) + "\n"
+    
+    def dump(self, path=METRICS_FILE):
+        """Grava métricas em arquivo (escrita atômica via arquivo temporário)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        self.last_dump = time.time()
+        return path
+    
+    def maybe_dump(self):
+        """Grava métricas periodicamente quando KANBAN_METRICS_INTERVAL estiver definido"""
+        if METRICS_DUMP_INTERVAL > 0 and time.time() - self.last_dump >= METRICS_DUMP_INTERVAL:
+            try:
+                self.dump()
+            except OSError as e:
+                logger.error("Erro ao gravar métricas: %s", e)
+
+@st.cache_resource
+def get_telemetry():
+    """Instância única de telemetria compartilhada por todas as sessões"""
+    return Telemetry()
+
+def payload_size(value):
+    """Estima tamanho em bytes de resultados/entradas comuns"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, BytesIO):
+        return value.getbuffer().nbytes
+    if hasattr(value, 'size') and isinstance(value.size, int):
+        return value.size
+    return None
+
+def instrumented(operation, rows=None, payload=None):
+    """Decorador que mede latência da operação.
+    
+    `rows` e `payload` recebem (args, result) e retornam a contagem de linhas
+    e o tamanho em bytes; por padrão são inferidos do resultado.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                get_telemetry().record_error(operation)
+                raise
+            except BaseException:
+                # st.rerun()/st.stop() interrompem o script sem ser erro
+                get_telemetry().record(operation, time.perf_counter() - start)
+                raise
+            elapsed = time.perf_counter() - start
+            
+            row_count = rows(args, result) if rows else (len(result) if isinstance(result, list) else None)
+            size = payload(args, result) if payload else payload_size(result)
+            get_telemetry().record(operation, elapsed, rows=row_count, payload_bytes=size)
+            return result
+        return wrapper
+    return decorator
+
+def report_error(operation, message):
+    """Exibe erro ao usuário, registra no log e contabiliza na telemetria"""
+    st.error(message)
+    logger.error("%s: %s", operation, message)
+    get_telemetry().record_error(operation)
+
+# =============================================================================
+# LIMITES DE USO
+# =============================================================================
+
+# Ações comuns (criar, mover, editar...): taxa por segundo e rajada máxima
+SESSION_RATE = float(os.getenv('KANBAN_SESSION_RATE', '2'))
+SESSION_BURST = float(os.getenv('KANBAN_SESSION_BURST', '20'))
+PROJECT_RATE = float(os.getenv('KANBAN_PROJECT_RATE', '10'))
+PROJECT_BURST = float(os.getenv('KANBAN_PROJECT_BURST', '60'))
+# Operações pesadas (exportar PDF, importar JSON)
+HEAVY_SESSION_RATE = float(os.getenv('KANBAN_HEAVY_SESSION_RATE', '0.1'))
+HEAVY_SESSION_BURST = float(os.getenv('KANBAN_HEAVY_SESSION_BURST', '3'))
+HEAVY_PROJECT_RATE = float(os.getenv('KANBAN_HEAVY_PROJECT_RATE', '0.2'))
+HEAVY_PROJECT_BURST = float(os.getenv('KANBAN_HEAVY_PROJECT_BURST', '5'))
+# Quantas operações pesadas podem rodar ao mesmo tempo no processo
+HEAVY_CONCURRENCY = int(os.getenv('KANBAN_HEAVY_CONCURRENCY', '2'))
+HEAVY_WAIT_SECONDS = 5
+# Tamanhos máximos aceitos
+MAX_JSON_UPLOAD_BYTES = int(os.getenv('KANBAN_MAX_JSON_BYTES', str(5 * 1024 * 1024)))
+MAX_LOGO_UPLOAD_BYTES = int(os.getenv('KANBAN_MAX_LOGO_BYTES', str(2 * 1024 * 1024)))
+MAX_IMPORT_TASKS = int(os.getenv('KANBAN_MAX_IMPORT_TASKS', '5000'))
+
+class RateLimiter:
+    """Token buckets por chave e semáforo para operações pesadas, compartilhados entre sessões"""
+    
+    # Acima desta quantidade de buckets, os que já estão cheios são descartados
+    MAX_BUCKETS = 10000
+    
+    def __init__(self, heavy_concurrency=HEAVY_CONCURRENCY):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.heavy_slots = threading.BoundedSemaphore(heavy_concurrency)
+    
+    def _take(self, key, rate, burst, now):
+        tokens, last = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            return False
+        self.buckets[key] = (tokens - 1, now)
+        return True
+    
+    def allow(self, limits):
+        """Consome um token de cada bucket em `limits` [(chave, taxa, rajada)].
+        
+        Só consome se todos tiverem saldo, para que uma recusa não gaste
+        tokens dos demais.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if len(self.buckets) > self.MAX_BUCKETS:
+                self._prune(now)
+            
+            snapshot = {key: self.buckets.get(key) for key, _, _ in limits}
+            for key, rate, burst in limits:
+                if not self._take(key, rate, burst, now):
+                    # Desfaz os buckets já consumidos nesta chamada
+                    for restored_key, state in snapshot.items():
+                        if restored_key == key:
+                            break
+                        if state is None:
+                            self.buckets.pop(restored_key, None)
+                        else:
+                            self.buckets[restored_key] = state
+                    return False
+            return True
+    
+    def _prune(self, now):
+        # Buckets sem uso há tempo suficiente para estarem cheios equivalem a ausentes
+        self.buckets = {
+            key: (tokens, last) for key, (tokens, last) in self.buckets.items()
+            if now - last < 60
+        }
+    
+    @contextlib.contextmanager
+    def heavy_slot(self, timeout=HEAVY_WAIT_SECONDS):
+        """Reserva uma vaga de operação pesada; produz False se não houver vaga a tempo"""
+        acquired = self.heavy_slots.acquire(timeout=timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.heavy_slots.release()
+
+@st.cache_resource
+def get_rate_limiter():
+    """Limitador único compartilhado por todas as sessões do processo"""
+    return RateLimiter()
+
+def allow_action(action, heavy=False):
+    """Verifica limites da sessão e do projeto; avisa o usuário quando excedidos"""
+    session_key = st.session_state.get('session_id', '')
+    project_code = st.session_state.get('project_code')
+    
+    if heavy:
+        limits = [(f"heavy:session:{session_key}", HEAVY_SESSION_RATE, HEAVY_SESSION_BURST)]
+        if project_code:
+            limits.append((f"heavy:project:{project_code}", HEAVY_PROJECT_RATE, HEAVY_PROJECT_BURST))
+    else:
+        limits = [(f"session:{session_key}", SESSION_RATE, SESSION_BURST)]
+        if project_code:
+            limits.append((f"project:{project_code}", PROJECT_RATE, PROJECT_BURST))
+    
+    if get_rate_limiter().allow(limits):
+        return True
+    
+    get_telemetry().record_error(f"rate_limited.{action}")
+    st.warning("⏳ Muitas ações em pouco tempo. Aguarde alguns segundos e tente novamente.")
+    return False
+
+# =============================================================================
+# MEMÓRIA DAS SESSÕES
+# =============================================================================
+
+# Sessões sem interação por mais que isso perdem o estado pesado (recarregado do banco na volta)
+SESSION_IDLE_SECONDS = float(os.getenv('KANBAN_SESSION_IDLE_SECONDS', '1800'))
+# Orçamento total (bytes aproximados) do estado pesado de todas as sessões do processo
+SESSION_MEMORY_BUDGET = int(os.getenv('KANBAN_SESSION_MEMORY_BUDGET', str(256 * 1024 * 1024)))
+SESSION_SWEEP_INTERVAL = float(os.getenv('KANBAN_SESSION_SWEEP_INTERVAL', '60'))
+# Custo fixo aproximado de um dict de tarefa (chaves, id, datas, cor...)
+TASK_OVERHEAD_BYTES = 600
+
+def estimate_session_bytes(tasks, project_metadata):
+    """Estimativa barata (bytes) do estado pesado de uma sessão"""
+    total = sum(len(value) for value in project_metadata.values() if isinstance(value, str))
+    for task in tasks:
+        total += TASK_OVERHEAD_BYTES + len(task.get('content') or '') + len(task.get('owner') or '')
+    return total
+
+class SessionRegistry:
+    """Guarda o estado pesado (tarefas, metadados com logo) de cada sessão, por session_id.
+    
+    O st.session_state da sessão guarda só o session_id. Entradas de sessões
+    ociosas (ou as menos recentes, acima do orçamento) são removidas daqui pela
+    varredura, sem tocar no estado interno do Streamlit; a sessão recarrega o
+    estado do banco no próximo rerun (ver init_session_state).
+    """
+    
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS, budget=SESSION_MEMORY_BUDGET,
+                 sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.idle_seconds = idle_seconds
+        self.budget = budget
+        self.sweep_interval = sweep_interval
+        self.evictions = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+    
+    def begin(self, session_id):
+        """Marca a sessão como em execução (não pode ser descartada durante o rerun).
+        
+        Retorna a entrada da sessão, ou None se ela é nova ou foi descartada.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.update(last_seen=time.monotonic(), active=True)
+            return entry
+    
+    def create(self, session_id, tasks, project_metadata):
+        """Registra o estado pesado da sessão, já marcada como em execução"""
+        entry = {'tasks': tasks, 'project_metadata': project_metadata, 'bytes': 0,
+                 'last_seen': time.monotonic(), 'active': True}
+        with self._lock:
+            self._sessions[session_id] = entry
+        return entry
+    
+    def end(self, session_id):
+        """Registra o tamanho do estado ao fim do rerun e faz a varredura periódica"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        if entry:
+            # Só a própria sessão altera a entrada; a estimativa fica fora do lock
+            size = estimate_session_bytes(entry['tasks'], entry['project_metadata'])
+            with self._lock:
+                entry.update(bytes=size, last_seen=time.monotonic(), active=False)
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+    
+    def sweep(self):
+        """Descarta sessões ociosas e, acima do orçamento, as menos recentes. Retorna quantas."""
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            self._last_sweep = now
+            candidates = sorted(
+                ((session_id, e) for session_id, e in self._sessions.items() if not e['active']),
+                key=lambda item: item[1]['last_seen']
+            )
+            total = sum(e['bytes'] for e in self._sessions.values())
+            for session_id, entry in candidates:
+                if now - entry['last_seen'] < self.idle_seconds and total <= self.budget:
+                    break
+                del self._sessions[session_id]
+                total -= entry['bytes']
+                evicted += 1
+            self.evictions += evicted
+        
+        if evicted:
+            logger.info("Sessões ociosas descartadas: %d", evicted)
+        return evicted
+    
+    def stats(self):
+        """Totais para o painel do admin"""
+        with self._lock:
+            sizes = [e['bytes'] for e in self._sessions.values()]
+        return {
+            'sessions': len(sizes),
+            'bytes': sum(sizes),
+            'largest': max(sizes, default=0),
+            'budget': self.budget,
+            'evictions': self.evictions
+        }
+
+@st.cache_resource
+def get_session_registry():
+    """Registro de sessões único por processo"""
+    return SessionRegistry()
+
+def end_session_run():
+    """Registra o tamanho do estado da sessão atual ao fim do rerun"""
+    if 'session_id' in st.session_state:
+        get_session_registry().end(st.session_state.session_id)
+
 # =============================================================================
 # CLASSE DATABASE
 # =============================================================================
 
+DB_PATH = os.getenv('KANBAN_DB_PATH', 'kanban_app.db')
+# Incrementar ao alterar tabelas/índices em init_database
+SCHEMA_VERSION = 3
+# Tentativas de sortear um código livre ao criar projeto
+PROJECT_CODE_ATTEMPTS = 10
+# Códigos por consulta em buscas em lote (abaixo do limite de parâmetros do SQLite)
+LOOKUP_BATCH_SIZE = 500
+
+# Backups online do arquivo SQLite
+BACKUP_DIR = os.getenv('KANBAN_BACKUP_DIR', 'backups')
+BACKUP_INTERVAL = float(os.getenv('KANBAN_BACKUP_INTERVAL', '0'))  # segundos (0 desativa)
+BACKUP_KEEP = int(os.getenv('KANBAN_BACKUP_KEEP', '7'))
+BACKUP_MAX_AGE_DAYS = float(os.getenv('KANBAN_BACKUP_MAX_AGE_DAYS', '30'))
+# Páginas copiadas por etapa e pausa entre etapas (libera o lock para outras conexões)
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+# Snapshots por projeto antes de limpar/importar
+SNAPSHOT_KEEP = int(os.getenv('KANBAN_SNAPSHOT_KEEP', '10'))
+SNAPSHOT_MAX_AGE_DAYS = float(os.getenv('KANBAN_SNAPSHOT_MAX_AGE_DAYS', '30'))
+
+# Modo particionado: '' (arquivo único), 'project' (um arquivo por projeto)
+# ou 'hash' (projetos distribuídos em KANBAN_SHARD_BUCKETS arquivos)
+SHARD_MODE = os.getenv('KANBAN_SHARD_MODE', '')
+SHARD_DIR = os.getenv('KANBAN_SHARD_DIR', 'shards')
+SHARD_BUCKETS = int(os.getenv('KANBAN_SHARD_BUCKETS', '16'))
+
+def online_copy(source_path, dest_path):
+    """Copia um banco SQLite com a API de backup, em etapas para não bloquear leitores/escritores"""
+    src = sqlite3.connect(source_path)
+    dst = sqlite3.connect(dest_path)
+    try:
+        with dst:
+            src.backup(dst, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+
 class Database:
     """Gerenciamento de persistência com SQLite"""
     
-    def __init__(self, db_path="kanban_app.db"):
+    # Sufixo dos backups gerados por run_backup
+    BACKUP_SUFFIX = ".db"
+    
+    def __init__(self, db_path=DB_PATH):
         self.db_path = db_path
         self.init_database()
     
+    @instrumented('db.init_database')
     def init_database(self):
         """Inicializa tabelas do banco"""
         max_retries = 3
@@ -118,6 +705,12 @@ class Database:
                 conn = sqlite3.connect(self.db_path)
                 cursor = conn.cursor()
                 
+                # Schema já atualizado: evita rodar DDL e migrações
+                cursor.execute("PRAGMA user_version")
+                if cursor.fetchone()[0] >= SCHEMA_VERSION:
+                    conn.close()
+                    return True
+                
                 # Tabela de projetos
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS projects (
@@ -125,7 +718,8 @@ class Database:
                         title TEXT,
                         admin_name TEXT,
                         created_at TEXT,
-                        logo_base64 TEXT
+                        logo_base64 TEXT,
+                        last_accessed_at TEXT
                     )
                 """)
                 
@@ -140,10 +734,79 @@ class Database:
                         column_name TEXT,
                         created_at TEXT,
                         updated_at TEXT,
+                        rank REAL,
                         FOREIGN KEY (project_code) REFERENCES projects(code)
                     )
                 """)
                 
+                # Migração: bancos antigos não possuem a coluna rank
+                cursor.execute("PRAGMA table_info(tasks)")
+                if 'rank' not in [info[1] for info in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE tasks ADD COLUMN rank REAL")
+                cursor.execute("UPDATE tasks SET rank = rowid * ? WHERE rank IS NULL", (RANK_GAP,))
+                
+                # Migração: último acesso, usado para achar projetos inativos
+                cursor.execute("PRAGMA table_info(projects)")
+                if 'last_accessed_at' not in [info[1] for info in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE projects ADD COLUMN last_accessed_at TEXT")
+                cursor.execute("UPDATE projects SET last_accessed_at = created_at WHERE last_accessed_at IS NULL")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_last_access ON projects (last_accessed_at)")
+                
+                # Índice para ler cada coluna já ordenada
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_tasks_column_rank
+                    ON tasks (project_code, column_name, rank)
+                """)
+                
+                # Snapshots de projeto tirados antes de operações destrutivas
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS project_snapshots (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        project_code TEXT,
+                        reason TEXT,
+                        created_at TEXT,
+                        task_count INTEGER,
+                        payload TEXT
+                    )
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_snapshots_project
+                    ON project_snapshots (project_code, created_at)
+                """)
+                
+                # Detalhes dos cards, carregados só quando o card é aberto
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS task_details (
+                        task_id TEXT PRIMARY KEY,
+                        project_code TEXT,
+                        description TEXT
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS task_comments (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        task_id TEXT,
+                        project_code TEXT,
+                        author TEXT,
+                        content TEXT,
+                        created_at TEXT
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS task_checklist (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        task_id TEXT,
+                        project_code TEXT,
+                        text TEXT,
+                        done INTEGER DEFAULT 0
+                    )
+                """)
+                for table in ('task_details', 'task_comments', 'task_checklist'):
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_project ON {table} (project_code)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_comments_task ON task_comments (task_id, id)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_checklist_task ON task_checklist (task_id, done)")
+                
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
                 conn.commit()
                 conn.close()
                 return True
@@ -152,151 +815,1108 @@ class Database:
                 if attempt < max_retries - 1:
                     time.sleep(retry_delay * (2 ** attempt) + random.uniform(0, 1))
                 else:
-                    st.error(f"Erro ao inicializar banco de dados: {e}")
+                    report_error('db.init_database', f"Erro ao inicializar banco de dados: {e}")
                     return False
     
+    @instrumented('db.save_project', rows=lambda args, result: 1,
+                  payload=lambda args, result: payload_size(args[2].get('logo_base64') or ''))
     def save_project(self, project_code, project_metadata):
-        """Salva metadados do projeto"""
+        """Salva metadados do projeto (preserva o último acesso de projetos existentes)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
-                INSERT OR REPLACE INTO projects 
-                (code, title, admin_name, created_at, logo_base64)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO projects 
+                (code, title, admin_name, created_at, logo_base64, last_accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (code) DO UPDATE SET
+                    title = excluded.title,
+                    admin_name = excluded.admin_name,
+                    created_at = excluded.created_at,
+                    logo_base64 = excluded.logo_base64
             """, (
                 project_code,
                 project_metadata.get('title', ''),
                 project_metadata.get('admin_name', ''),
                 project_metadata.get('created_at', ''),
-                project_metadata.get('logo_base64', '')
+                project_metadata.get('logo_base64', ''),
+                datetime.now().isoformat()
+            ))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            report_error('db.save_project', f"Erro ao salvar projeto: {e}")
+            return False
+    
+    @instrumented('db.allocate_project', rows=lambda args, result: 1 if result else 0)
+    def allocate_project(self, project_metadata):
+        """Cria projeto com código novo e retorna o código (None se falhar).
+        
+        A unicidade é garantida pela chave primária: em colisão sorteia outro
+        código, sem nunca sobrescrever um projeto existente. Códigos com
+        snapshots (projetos removidos) também não são reutilizados.
+        """
+        for _ in range(PROJECT_CODE_ATTEMPTS):
+            project_code = generate_project_code()
+            conn = None
+            try:
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                
+                cursor.execute(
+                    "SELECT 1 FROM project_snapshots WHERE project_code = ? LIMIT 1", (project_code,)
+                )
+                if cursor.fetchone():
+                    conn.rollback()
+                    continue
+                
+                now = datetime.now().isoformat()
+                cursor.execute("""
+                    INSERT INTO projects
+                    (code, title, admin_name, created_at, logo_base64, last_accessed_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    project_code,
+                    project_metadata.get('title', ''),
+                    project_metadata.get('admin_name', ''),
+                    project_metadata.get('created_at') or now,
+                    project_metadata.get('logo_base64', ''),
+                    now
+                ))
+                conn.commit()
+                return project_code
+            except sqlite3.IntegrityError:
+                logger.warning("Colisão de código de projeto: %s", project_code)
+            except Exception as e:
+                report_error('db.allocate_project', f"Erro ao criar projeto: {e}")
+                return None
+            finally:
+                if conn:
+                    conn.close()
+        
+        report_error('db.allocate_project', "Erro ao criar projeto: nenhum código livre encontrado")
+        return None
+    
+    @instrumented('db.load_project', rows=lambda args, result: 1 if result else 0,
+                  payload=lambda args, result: payload_size((result or {}).get('logo_base64') or ''))
+    def load_project(self, project_code):
+        """Carrega metadados do projeto"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT * FROM projects WHERE code = ?", (project_code,))
+            row = cursor.fetchone()
+            conn.close()
+            
+            if row:
+                return {
+                    'code': row[0],
+                    'title': row[1],
+                    'admin_name': row[2],
+                    'created_at': row[3],
+                    'logo_base64': row[4]
+                }
+            return None
+        except Exception as e:
+            report_error('db.load_project', f"Erro ao carregar projeto: {e}")
+            return None
+    
+    @instrumented('db.save_tasks', rows=lambda args, result: len(args[2]), payload=lambda args, result: None)
+    def save_tasks(self, project_code, tasks):
+        """Salva todas as tarefas do projeto"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # Remove tarefas antigas do projeto
+            cursor.execute("DELETE FROM tasks WHERE project_code = ?", (project_code,))
+            
+            # Garante que toda tarefa tenha posição na coluna
+            assign_missing_ranks(tasks)
+            
+            # Insere tarefas atualizadas
+            for task in tasks:
+                cursor.execute("""
+                    INSERT INTO tasks 
+                    (id, project_code, content, color, owner, column_name, created_at, updated_at, rank)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    task['id'],
+                    project_code,
+                    task['content'],
+                    task['color'],
+                    task['owner'],
+                    task['column'],
+                    task['created_at'],
+                    task['updated_at'],
+                    task['rank']
+                ))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            report_error('db.save_tasks', f"Erro ao salvar tarefas: {e}")
+            return False
+    
+    @instrumented('db.load_tasks')
+    def load_tasks(self, project_code):
+        """Carrega todas as tarefas do projeto (resumo: detalhes entram só como contagens)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT t.id, t.content, t.color, t.owner, t.column_name, t.created_at, t.updated_at, t.rank,
+                    (SELECT COUNT(*) FROM task_comments c WHERE c.task_id = t.id),
+                    (SELECT COUNT(*) FROM task_checklist k WHERE k.task_id = t.id),
+                    (SELECT COUNT(*) FROM task_checklist k WHERE k.task_id = t.id AND k.done = 1),
+                    EXISTS (SELECT 1 FROM task_details d WHERE d.task_id = t.id AND d.description != '')
+                FROM tasks t WHERE t.project_code = ?
+                ORDER BY t.column_name, t.rank
+            """, (project_code,))
+            rows = cursor.fetchall()
+            conn.close()
+            
+            tasks = []
+            for row in rows:
+                tasks.append({
+                    'id': row[0],
+                    'content': row[1],
+                    'color': row[2],
+                    'owner': row[3],
+                    'column': row[4],
+                    'created_at': row[5],
+                    'updated_at': row[6],
+                    'rank': row[7],
+                    'comment_count': row[8],
+                    'checklist_total': row[9],
+                    'checklist_done': row[10],
+                    'has_description': bool(row[11])
+                })
+            
+            return tasks
+        except Exception as e:
+            report_error('db.load_tasks', f"Erro ao carregar tarefas: {e}")
+            return []
+    
+    @instrumented('db.update_task_position', rows=lambda args, result: 1, payload=lambda args, result: None)
+    def update_task_position(self, project_code, task):
+        """Atualiza coluna e posição de uma única tarefa"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE tasks SET column_name = ?, rank = ?, updated_at = ?
+                WHERE id = ? AND project_code = ?
+            """, (
+                task['column'],
+                task['rank'],
+                task['updated_at'],
+                task['id'],
+                project_code
+            ))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            report_error('db.update_task_position', f"Erro ao reordenar tarefa: {e}")
+            return False
+
+    @instrumented('db.list_projects')
+    def list_projects(self):
+        """Lista todos os projetos (sem logo) com a quantidade de tarefas"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT p.code, p.title, p.admin_name, p.created_at, p.last_accessed_at, COUNT(t.id)
+                FROM projects p LEFT JOIN tasks t ON t.project_code = p.code
+                GROUP BY p.code ORDER BY p.created_at
+            """)
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {'code': row[0], 'title': row[1], 'admin_name': row[2], 'created_at': row[3],
+                 'last_accessed_at': row[4], 'task_count': row[5]}
+                for row in rows
+            ]
+        except Exception as e:
+            report_error('db.list_projects', f"Erro ao listar projetos: {e}")
+            return []
+    
+    @instrumented('db.lookup_projects', rows=lambda args, result: len(result), payload=lambda args, result: None)
+    def lookup_projects(self, project_codes):
+        """Busca vários projetos de uma vez (sem logo); retorna dict código -> metadados"""
+        projects = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            for batch in chunked(list(dict.fromkeys(project_codes)), LOOKUP_BATCH_SIZE):
+                placeholders = ', '.join('?' * len(batch))
+                cursor.execute(f"""
+                    SELECT code, title, admin_name, created_at, last_accessed_at
+                    FROM projects WHERE code IN ({placeholders})
+                """, batch)
+                for row in cursor.fetchall():
+                    projects[row[0]] = {
+                        'code': row[0], 'title': row[1], 'admin_name': row[2],
+                        'created_at': row[3], 'last_accessed_at': row[4]
+                    }
+            
+            conn.close()
+        except Exception as e:
+            report_error('db.lookup_projects', f"Erro ao buscar projetos: {e}")
+        return projects
+    
+    @instrumented('db.touch_project', rows=lambda args, result: 1 if result else 0)
+    def touch_project(self, project_code):
+        """Registra acesso ao projeto (login ou retorno de sessão ociosa)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(
+                "UPDATE projects SET last_accessed_at = ? WHERE code = ?",
+                (datetime.now().isoformat(), project_code)
+            )
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            report_error('db.touch_project', f"Erro ao registrar acesso: {e}")
+            return False
+    
+    @instrumented('db.list_inactive_projects')
+    def list_inactive_projects(self, accessed_before):
+        """Projetos sem acesso desde `accessed_before` (ISO), do mais antigo ao mais recente"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT code, title, admin_name, created_at, last_accessed_at
+                FROM projects WHERE last_accessed_at < ?
+                ORDER BY last_accessed_at
+            """, (accessed_before,))
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {'code': row[0], 'title': row[1], 'admin_name': row[2], 'created_at': row[3], 'last_accessed_at': row[4]}
+                for row in rows
+            ]
+        except Exception as e:
+            report_error('db.list_inactive_projects', f"Erro ao listar projetos inativos: {e}")
+            return []
+    
+    @instrumented('db.move_column_tasks', rows=lambda args, result: result)
+    def move_column_tasks(self, project_code, from_column, to_column):
+        """Move todas as tarefas de uma coluna para o fim de outra, mantendo a ordem"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT MAX(rank) FROM tasks WHERE project_code = ? AND column_name = ?",
+                (project_code, to_column)
+            )
+            target_max = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT MIN(rank) FROM tasks WHERE project_code = ? AND column_name = ?",
+                (project_code, from_column)
+            )
+            source_min = cursor.fetchone()[0]
+            
+            # Desloca os ranks da origem para depois do último da coluna de destino
+            offset = 0.0
+            if target_max is not None and source_min is not None:
+                offset = target_max - source_min + RANK_GAP
+            
+            cursor.execute("""
+                UPDATE tasks SET column_name = ?, rank = rank + ?, updated_at = ?
+                WHERE project_code = ? AND column_name = ?
+            """, (to_column, offset, datetime.now().isoformat(), project_code, from_column))
+            moved = cursor.rowcount
+            
+            conn.commit()
+            conn.close()
+            return moved
+        except Exception as e:
+            report_error('db.move_column_tasks', f"Erro ao mover tarefas: {e}")
+            return 0
+    
+    @instrumented('db.delete_project')
+    def delete_project(self, project_code, keep_snapshots=True):
+        """Remove projeto e suas tarefas.
+        
+        Com keep_snapshots um snapshot é guardado antes; sem ele (projeto já
+        arquivado fora do banco) os snapshots do projeto também são removidos.
+        """
+        if keep_snapshots:
+            self.save_snapshot(project_code, 'purge')
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            if not keep_snapshots:
+                cursor.execute("DELETE FROM project_snapshots WHERE project_code = ?", (project_code,))
+            cursor.execute("DELETE FROM tasks WHERE project_code = ?", (project_code,))
+            cursor.execute("DELETE FROM projects WHERE code = ?", (project_code,))
+            for table in ('task_details', 'task_comments', 'task_checklist'):
+                cursor.execute(f"DELETE FROM {table} WHERE project_code = ?", (project_code,))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            report_error('db.delete_project', f"Erro ao remover projeto: {e}")
+            return False
+    
+    @instrumented('db.save_snapshot', rows=lambda args, result: 1 if result else 0)
+    def save_snapshot(self, project_code, reason):
+        """Guarda o estado atual do projeto antes de uma operação destrutiva"""
+        project = self.load_project(project_code)
+        if not project:
+            return None
+        tasks = self.load_tasks(project_code)
+        details = self.export_details(project_code)
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO project_snapshots (project_code, reason, created_at, task_count, payload)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                project_code,
+                reason,
+                datetime.now().isoformat(),
+                len(tasks),
+                json.dumps({'project_metadata': project, 'tasks': tasks, 'task_details': details}, ensure_ascii=False)
             ))
+            snapshot_id = cursor.lastrowid
+            
+            # Retenção por quantidade (deste projeto) e por idade (de todos os projetos)
+            cutoff = (datetime.now() - timedelta(days=SNAPSHOT_MAX_AGE_DAYS)).isoformat()
+            cursor.execute("DELETE FROM project_snapshots WHERE created_at < ?", (cutoff,))
+            cursor.execute("""
+                DELETE FROM project_snapshots
+                WHERE project_code = ? AND id NOT IN (
+                    SELECT id FROM project_snapshots WHERE project_code = ?
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                )
+            """, (project_code, project_code, SNAPSHOT_KEEP))
+            
+            conn.commit()
+            conn.close()
+            return snapshot_id
+        except Exception as e:
+            report_error('db.save_snapshot', f"Erro ao criar snapshot: {e}")
+            return None
+    
+    @instrumented('db.prune_snapshots', rows=lambda args, result: result)
+    def prune_snapshots(self, max_age_days=SNAPSHOT_MAX_AGE_DAYS):
+        """Remove snapshots mais antigos que max_age_days de todos os projetos (inclusive removidos)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+            removed = conn.execute("DELETE FROM project_snapshots WHERE created_at < ?", (cutoff,)).rowcount
+            conn.commit()
+            conn.close()
+            return removed
+        except Exception as e:
+            report_error('db.prune_snapshots', f"Erro ao limpar snapshots: {e}")
+            return 0
+    
+    @instrumented('db.list_snapshots')
+    def list_snapshots(self, project_code):
+        """Lista snapshots do projeto, do mais recente ao mais antigo"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, reason, created_at, task_count FROM project_snapshots
+                WHERE project_code = ? ORDER BY created_at DESC, id DESC
+            """, (project_code,))
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {'id': row[0], 'reason': row[1], 'created_at': row[2], 'task_count': row[3]}
+                for row in rows
+            ]
+        except Exception as e:
+            report_error('db.list_snapshots', f"Erro ao listar snapshots: {e}")
+            return []
+    
+    @instrumented('db.restore_snapshot', rows=lambda args, result: len(result['tasks']) if result else 0)
+    def restore_snapshot(self, project_code, snapshot_id):
+        """Restaura projeto a partir de um snapshot (o estado atual também é guardado)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT payload FROM project_snapshots WHERE id = ? AND project_code = ?",
+                (snapshot_id, project_code)
+            )
+            row = cursor.fetchone()
+            conn.close()
+        except Exception as e:
+            report_error('db.restore_snapshot', f"Erro ao restaurar snapshot: {e}")
+            return None
+        
+        if not row:
+            return None
+        
+        data = json.loads(row[0])
+        self.save_snapshot(project_code, 'restore')
+        if self.save_project(project_code, data['project_metadata']) and self.save_tasks(project_code, data['tasks']):
+            self.import_details(project_code, data.get('task_details') or {})
+            self.purge_orphan_details(project_code)
+            return data
+        return None
+    
+    @instrumented('db.load_task_details')
+    def load_task_details(self, project_code, task_id):
+        """Carrega descrição, comentários e checklist de um card"""
+        details = {'description': '', 'comments': [], 'checklist': []}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT description FROM task_details WHERE task_id = ? AND project_code = ?",
+                (task_id, project_code)
+            )
+            row = cursor.fetchone()
+            if row:
+                details['description'] = row[0] or ''
+            
+            cursor.execute("""
+                SELECT id, author, content, created_at FROM task_comments
+                WHERE task_id = ? AND project_code = ? ORDER BY id
+            """, (task_id, project_code))
+            details['comments'] = [
+                {'id': r[0], 'author': r[1], 'content': r[2], 'created_at': r[3]}
+                for r in cursor.fetchall()
+            ]
+            
+            cursor.execute("""
+                SELECT id, text, done FROM task_checklist
+                WHERE task_id = ? AND project_code = ? ORDER BY id
+            """, (task_id, project_code))
+            details['checklist'] = [
+                {'id': r[0], 'text': r[1], 'done': bool(r[2])}
+                for r in cursor.fetchall()
+            ]
+            
+            conn.close()
+        except Exception as e:
+            report_error('db.load_task_details', f"Erro ao carregar detalhes do card: {e}")
+        return details
+    
+    def _update_details(self, operation, message, project_code, task_id, updated_at, statements):
+        """Executa alterações de detalhes e atualiza updated_at do card na mesma transação"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            for sql, params in statements:
+                cursor.execute(sql, params)
+            cursor.execute(
+                "UPDATE tasks SET updated_at = ? WHERE id = ? AND project_code = ?",
+                (updated_at, task_id, project_code)
+            )
             
             conn.commit()
             conn.close()
             return True
         except Exception as e:
-            st.error(f"Erro ao salvar projeto: {e}")
+            report_error(operation, f"{message}: {e}")
             return False
     
-    def load_project(self, project_code):
-        """Carrega metadados do projeto"""
+    @instrumented('db.save_task_description', rows=lambda args, result: 1 if result else 0)
+    def save_task_description(self, project_code, task_id, description, updated_at):
+        """Salva descrição longa do card"""
+        return self._update_details('db.save_task_description', "Erro ao salvar descrição", project_code, task_id, updated_at, [(
+            "INSERT OR REPLACE INTO task_details (task_id, project_code, description) VALUES (?, ?, ?)",
+            (task_id, project_code, description)
+        )])
+    
+    @instrumented('db.add_comment', rows=lambda args, result: 1 if result else 0)
+    def add_comment(self, project_code, task_id, author, content, updated_at):
+        """Adiciona comentário ao card"""
+        return self._update_details('db.add_comment', "Erro ao comentar", project_code, task_id, updated_at, [(
+            "INSERT INTO task_comments (task_id, project_code, author, content, created_at) VALUES (?, ?, ?, ?, ?)",
+            (task_id, project_code, author, content, updated_at)
+        )])
+    
+    @instrumented('db.add_checklist_item', rows=lambda args, result: 1 if result else 0)
+    def add_checklist_item(self, project_code, task_id, text, updated_at):
+        """Adiciona item ao checklist do card"""
+        return self._update_details('db.add_checklist_item', "Erro ao adicionar item", project_code, task_id, updated_at, [(
+            "INSERT INTO task_checklist (task_id, project_code, text, done) VALUES (?, ?, ?, 0)",
+            (task_id, project_code, text)
+        )])
+    
+    @instrumented('db.set_checklist_item', rows=lambda args, result: 1 if result else 0)
+    def set_checklist_item(self, project_code, task_id, item_id, done, updated_at):
+        """Marca ou desmarca item do checklist"""
+        return self._update_details('db.set_checklist_item', "Erro ao atualizar item", project_code, task_id, updated_at, [(
+            "UPDATE task_checklist SET done = ? WHERE id = ? AND task_id = ? AND project_code = ?",
+            (1 if done else 0, item_id, task_id, project_code)
+        )])
+    
+    @instrumented('db.delete_checklist_item', rows=lambda args, result: 1 if result else 0)
+    def delete_checklist_item(self, project_code, task_id, item_id, updated_at):
+        """Remove item do checklist"""
+        return self._update_details('db.delete_checklist_item', "Erro ao remover item", project_code, task_id, updated_at, [(
+            "DELETE FROM task_checklist WHERE id = ? AND task_id = ? AND project_code = ?",
+            (item_id, task_id, project_code)
+        )])
+    
+    @instrumented('db.export_details', rows=lambda args, result: len(result), payload=lambda args, result: None)
+    def export_details(self, project_code):
+        """Detalhes de todos os cards do projeto, por id (apenas cards que têm algum detalhe)"""
+        details = {}
+        
+        def card(task_id):
+            return details.setdefault(task_id, {'description': '', 'comments': [], 'checklist': []})
+        
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("SELECT * FROM projects WHERE code = ?", (project_code,))
-            row = cursor.fetchone()
-            conn.close()
+            cursor.execute(
+                "SELECT task_id, description FROM task_details WHERE project_code = ? AND description != ''",
+                (project_code,)
+            )
+            for task_id, description in cursor.fetchall():
+                card(task_id)['description'] = description
             
-            if row:
-                return {
-                    'code': row[0],
-                    'title': row[1],
-                    'admin_name': row[2],
-                    'created_at': row[3],
-                    'logo_base64': row[4]
-                }
-            return None
+            cursor.execute(
+                "SELECT task_id, author, content, created_at FROM task_comments WHERE project_code = ? ORDER BY id",
+                (project_code,)
+            )
+            for task_id, author, content, created_at in cursor.fetchall():
+                card(task_id)['comments'].append({'author': author, 'content': content, 'created_at': created_at})
+            
+            cursor.execute(
+                "SELECT task_id, text, done FROM task_checklist WHERE project_code = ? ORDER BY id",
+                (project_code,)
+            )
+            for task_id, text, done in cursor.fetchall():
+                card(task_id)['checklist'].append({'text': text, 'done': bool(done)})
+            
+            conn.close()
         except Exception as e:
-            st.error(f"Erro ao carregar projeto: {e}")
-            return None
+            report_error('db.export_details', f"Erro ao exportar detalhes: {e}")
+        return details
     
-    def save_tasks(self, project_code, tasks):
-        """Salva todas as tarefas do projeto"""
+    @instrumented('db.import_details', rows=lambda args, result: len(args[2]), payload=lambda args, result: None)
+    def import_details(self, project_code, details):
+        """Substitui todos os detalhes do projeto por `details` (formato de export_details).
+        
+        export_details omite cards sem detalhes, então os detalhes atuais de
+        todos os cards são apagados antes de inserir.
+        """
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Remove tarefas antigas do projeto
-            cursor.execute("DELETE FROM tasks WHERE project_code = ?", (project_code,))
+            for table in ('task_details', 'task_comments', 'task_checklist'):
+                cursor.execute(f"DELETE FROM {table} WHERE project_code = ?", (project_code,))
             
-            # Insere tarefas atualizadas
-            for task in tasks:
-                cursor.execute("""
-                    INSERT INTO tasks 
-                    (id, project_code, content, color, owner, column_name, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    task['id'],
-                    project_code,
-                    task['content'],
-                    task['color'],
-                    task['owner'],
-                    task['column'],
-                    task['created_at'],
-                    task['updated_at']
-                ))
+            for task_id, card in details.items():
+                if card.get('description'):
+                    cursor.execute(
+                        "INSERT INTO task_details (task_id, project_code, description) VALUES (?, ?, ?)",
+                        (task_id, project_code, card['description'])
+                    )
+                cursor.executemany(
+                    "INSERT INTO task_comments (task_id, project_code, author, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(task_id, project_code, c.get('author'), c.get('content'), c.get('created_at'))
+                     for c in card.get('comments', [])]
+                )
+                cursor.executemany(
+                    "INSERT INTO task_checklist (task_id, project_code, text, done) VALUES (?, ?, ?, ?)",
+                    [(task_id, project_code, i.get('text'), 1 if i.get('done') else 0)
+                     for i in card.get('checklist', [])]
+                )
             
             conn.commit()
             conn.close()
             return True
         except Exception as e:
-            st.error(f"Erro ao salvar tarefas: {e}")
+            report_error('db.import_details', f"Erro ao importar detalhes: {e}")
             return False
     
-    def load_tasks(self, project_code):
-        """Carrega todas as tarefas do projeto"""
+    @instrumented('db.purge_orphan_details')
+    def purge_orphan_details(self, project_code):
+        """Remove detalhes de cards que não existem mais no projeto"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("SELECT * FROM tasks WHERE project_code = ?", (project_code,))
-            rows = cursor.fetchall()
-            conn.close()
-            
-            tasks = []
-            for row in rows:
-                tasks.append({
-                    'id': row[0],
-                    'content': row[2],
-                    'color': row[3],
-                    'owner': row[4],
-                    'column': row[5],
-                    'created_at': row[6],
-                    'updated_at': row[7]
-                })
+            for table in ('task_details', 'task_comments', 'task_checklist'):
+                cursor.execute(f"""
+                    DELETE FROM {table} WHERE project_code = ?
+                    AND task_id NOT IN (SELECT id FROM tasks WHERE project_code = ?)
+                """, (project_code, project_code))
             
-            return tasks
+            conn.commit()
+            conn.close()
+            return True
         except Exception as e:
-            st.error(f"Erro ao carregar tarefas: {e}")
-            return []
+            report_error('db.purge_orphan_details', f"Erro ao limpar detalhes: {e}")
+            return False
+    
+    @instrumented('db.backup_to')
+    def backup_to(self, dest_path):
+        """Copia o banco para dest_path sem parar o app"""
+        online_copy(self.db_path, dest_path)
+        return dest_path
+    
+    @instrumented('db.restore_from')
+    def restore_from(self, backup_path):
+        """Restaura o banco inteiro a partir de um arquivo de backup, com o app em execução"""
+        if not Path(backup_path).is_file():
+            raise FileNotFoundError(backup_path)
+        online_copy(backup_path, self.db_path)
+        return backup_path
+
+# =============================================================================
+# SHARDING
+# =============================================================================
+
+class ShardedDatabase:
+    """Banco particionado: cada projeto (ou grupo de projetos) em um arquivo próprio.
+    
+    Um catálogo pequeno registra em qual shard cada projeto está; como o
+    registro nunca muda, o mapeamento fica em memória após a primeira consulta.
+    Os shards são instâncias de Database criadas sob demanda (o init_database
+    roda uma vez por shard) e mantidas enquanto o processo viver: guardam só o
+    caminho do arquivo, e cada operação abre a sua conexão como no modo de
+    arquivo único. Mesma interface pública de Database.
+    """
+    
+    # Backups do modo particionado são pastas com o catálogo e todos os shards
+    BACKUP_SUFFIX = ""
+    
+    def __init__(self, shard_dir=SHARD_DIR, mode=SHARD_MODE or 'project', buckets=SHARD_BUCKETS):
+        if mode not in ('project', 'hash'):
+            raise ValueError(f"modo de shard inválido: {mode}")
+        self.db_path = shard_dir
+        self.mode = mode
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.databases = {}
+        # projeto -> shard já lidos do catálogo (só projetos registrados)
+        self.project_shards = {}
+        
+        Path(shard_dir).mkdir(parents=True, exist_ok=True)
+        self.catalog_path = str(Path(shard_dir) / "catalog.db")
+        self.init_catalog()
+    
+    def init_catalog(self):
+        """Inicializa tabela de roteamento projeto -> shard"""
+        conn = sqlite3.connect(self.catalog_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS project_shards (
+                project_code TEXT PRIMARY KEY,
+                shard TEXT
+            )
+        """)
+        conn.commit()
+        conn.close()
+    
+    def shard_name(self, project_code):
+        """Nome do arquivo de shard para o projeto"""
+        if self.mode == 'hash':
+            bucket = zlib.crc32(project_code.encode('utf-8')) % self.buckets
+            return f"shard_{bucket:03d}.db"
+        # Códigos são alfanuméricos; o filtro protege contra nomes arbitrários vindos de JSON
+        safe_code = ''.join(c for c in project_code if c.isalnum() or c in '-_')
+        return f"project_{safe_code}.db"
+    
+    def lookup_shard(self, project_code):
+        """Retorna o shard registrado no catálogo (ou None)"""
+        with self.lock:
+            shard = self.project_shards.get(project_code)
+        if shard:
+            return shard
+        
+        conn = sqlite3.connect(self.catalog_path)
+        row = conn.execute(
+            "SELECT shard FROM project_shards WHERE project_code = ?", (project_code,)
+        ).fetchone()
+        conn.close()
+        if not row:
+            # Ausências não vão para o cache: outro processo (ex.: a CLI) pode registrar o projeto
+            return None
+        with self.lock:
+            self.project_shards[project_code] = row[0]
+        return row[0]
+    
+    def register(self, project_code):
+        """Registra o projeto no catálogo e retorna o nome do shard"""
+        shard = self.lookup_shard(project_code)
+        if shard:
+            return shard
+        shard = self.shard_name(project_code)
+        conn = sqlite3.connect(self.catalog_path)
+        conn.execute(
+            "INSERT OR IGNORE INTO project_shards (project_code, shard) VALUES (?, ?)",
+            (project_code, shard)
+        )
+        conn.commit()
+        conn.close()
+        # Em corrida com outro processo, vale o registro que ficou no catálogo
+        return self.lookup_shard(project_code)
+    
+    def shard(self, shard_name):
+        """Cria (ou reutiliza) o Database do shard"""
+        with self.lock:
+            database = self.databases.get(shard_name)
+        if database:
+            return database
+        
+        database = Database(str(Path(self.db_path) / shard_name))
+        with self.lock:
+            return self.databases.setdefault(shard_name, database)
+    
+    def for_project(self, project_code, create=False):
+        """Database do shard do projeto; None se o projeto não existe e create=False"""
+        shard_name = self.register(project_code) if create else self.lookup_shard(project_code)
+        return self.shard(shard_name) if shard_name else None
+    
+    def shard_names(self):
+        """Shards com pelo menos um projeto registrado"""
+        conn = sqlite3.connect(self.catalog_path)
+        rows = conn.execute("SELECT DISTINCT shard FROM project_shards ORDER BY shard").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+    
+    def save_project(self, project_code, project_metadata):
+        return self.for_project(project_code, create=True).save_project(project_code, project_metadata)
+    
+    def allocate_project(self, project_metadata):
+        """Reserva um código novo no catálogo (chave primária) e cria o projeto no shard"""
+        for _ in range(PROJECT_CODE_ATTEMPTS):
+            project_code = generate_project_code()
+            shard_name = self.shard_name(project_code)
+            conn = sqlite3.connect(self.catalog_path)
+            try:
+                conn.execute(
+                    "INSERT INTO project_shards (project_code, shard) VALUES (?, ?)",
+                    (project_code, shard_name)
+                )
+                conn.commit()
+            except sqlite3.IntegrityError:
+                logger.warning("Colisão de código de projeto: %s", project_code)
+                continue
+            finally:
+                conn.close()
+            with self.lock:
+                self.project_shards[project_code] = shard_name
+            project_metadata = {'created_at': datetime.now().isoformat(), **project_metadata}
+            return project_code if self.shard(shard_name).save_project(project_code, project_metadata) else None
+        
+        report_error('db.allocate_project', "Erro ao criar projeto: nenhum código livre encontrado")
+        return None
+    
+    def lookup_projects(self, project_codes):
+        """Agrupa os códigos por shard (uma consulta no catálogo) e busca cada grupo em lote"""
+        by_shard = {}
+        conn = sqlite3.connect(self.catalog_path)
+        for batch in chunked(list(dict.fromkeys(project_codes)), LOOKUP_BATCH_SIZE):
+            placeholders = ', '.join('?' * len(batch))
+            for project_code, shard_name in conn.execute(
+                f"SELECT project_code, shard FROM project_shards WHERE project_code IN ({placeholders})", batch
+            ):
+                by_shard.setdefault(shard_name, []).append(project_code)
+        conn.close()
+        
+        projects = {}
+        for shard_name, codes in by_shard.items():
+            projects.update(self.shard(shard_name).lookup_projects(codes))
+        return projects
+    
+    def touch_project(self, project_code):
+        database = self.for_project(project_code)
+        return database.touch_project(project_code) if database else False
+    
+    def list_inactive_projects(self, accessed_before):
+        projects = []
+        for shard_name in self.shard_names():
+            projects.extend(self.shard(shard_name).list_inactive_projects(accessed_before))
+        projects.sort(key=lambda p: p['last_accessed_at'] or '')
+        return projects
+    
+    def load_project(self, project_code):
+        database = self.for_project(project_code)
+        return database.load_project(project_code) if database else None
+    
+    def save_tasks(self, project_code, tasks):
+        return self.for_project(project_code, create=True).save_tasks(project_code, tasks)
+    
+    def load_tasks(self, project_code):
+        database = self.for_project(project_code)
+        return database.load_tasks(project_code) if database else []
+    
+    def update_task_position(self, project_code, task):
+        database = self.for_project(project_code)
+        return database.update_task_position(project_code, task) if database else False
+    
+    def list_projects(self):
+        projects = []
+        for shard_name in self.shard_names():
+            projects.extend(self.shard(shard_name).list_projects())
+        projects.sort(key=lambda p: p['created_at'] or '')
+        return projects
+    
+    def move_column_tasks(self, project_code, from_column, to_column):
+        database = self.for_project(project_code)
+        return database.move_column_tasks(project_code, from_column, to_column) if database else 0
+    
+    def delete_project(self, project_code, keep_snapshots=True):
+        """Remove o projeto do shard; o registro no catálogo é mantido (o código não é reutilizado)"""
+        database = self.for_project(project_code)
+        return database.delete_project(project_code, keep_snapshots) if database else False
+    
+    def save_snapshot(self, project_code, reason):
+        database = self.for_project(project_code)
+        return database.save_snapshot(project_code, reason) if database else None
+    
+    def prune_snapshots(self, max_age_days=SNAPSHOT_MAX_AGE_DAYS):
+        return sum(self.shard(shard_name).prune_snapshots(max_age_days) for shard_name in self.shard_names())
+    
+    def list_snapshots(self, project_code):
+        database = self.for_project(project_code)
+        return database.list_snapshots(project_code) if database else []
+    
+    def restore_snapshot(self, project_code, snapshot_id):
+        database = self.for_project(project_code)
+        return database.restore_snapshot(project_code, snapshot_id) if database else None
+    
+    def load_task_details(self, project_code, task_id):
+        database = self.for_project(project_code)
+        return database.load_task_details(project_code, task_id) if database else {'description': '', 'comments': [], 'checklist': []}
+    
+    def save_task_description(self, project_code, task_id, description, updated_at):
+        return self.for_project(project_code, create=True).save_task_description(project_code, task_id, description, updated_at)
+    
+    def add_comment(self, project_code, task_id, author, content, updated_at):
+        return self.for_project(project_code, create=True).add_comment(project_code, task_id, author, content, updated_at)
+    
+    def add_checklist_item(self, project_code, task_id, text, updated_at):
+        return self.for_project(project_code, create=True).add_checklist_item(project_code, task_id, text, updated_at)
+    
+    def set_checklist_item(self, project_code, task_id, item_id, done, updated_at):
+        database = self.for_project(project_code)
+        return database.set_checklist_item(project_code, task_id, item_id, done, updated_at) if database else False
+    
+    def delete_checklist_item(self, project_code, task_id, item_id, updated_at):
+        database = self.for_project(project_code)
+        return database.delete_checklist_item(project_code, task_id, item_id, updated_at) if database else False
+    
+    def export_details(self, project_code):
+        database = self.for_project(project_code)
+        return database.export_details(project_code) if database else {}
+    
+    def import_details(self, project_code, details):
+        return self.for_project(project_code, create=True).import_details(project_code, details)
+    
+    def purge_orphan_details(self, project_code):
+        database = self.for_project(project_code)
+        return database.purge_orphan_details(project_code) if database else False
+    
+    def backup_to(self, dest_path):
+        """Backup online do catálogo e de cada shard para a pasta dest_path"""
+        dest = Path(dest_path)
+        dest.mkdir(parents=True, exist_ok=True)
+        online_copy(self.catalog_path, str(dest / "catalog.db"))
+        for shard_name in self.shard_names():
+            self.shard(shard_name).backup_to(str(dest / shard_name))
+        return dest_path
+    
+    def restore_from(self, backup_path):
+        """Restaura catálogo e shards a partir de uma pasta gerada por backup_to"""
+        source = Path(backup_path)
+        if not source.is_dir():
+            raise FileNotFoundError(backup_path)
+        for backup_file in sorted(source.glob("*.db")):
+            online_copy(str(backup_file), str(Path(self.db_path) / backup_file.name))
+        with self.lock:
+            self.databases.clear()
+            self.project_shards.clear()
+        return backup_path
+
+def split_into_shards(source, sharded):
+    """Copia projetos, tarefas e snapshots de um Database de arquivo único para shards"""
+    copied = 0
+    for project in source.list_projects():
+        project_code = project['code']
+        metadata = source.load_project(project_code)
+        target = sharded.for_project(project_code, create=True)
+        
+        target.save_project(project_code, metadata)
+        target.save_tasks(project_code, source.load_tasks(project_code))
+        target.import_details(project_code, source.export_details(project_code))
+        
+        conn = sqlite3.connect(source.db_path)
+        snapshots = conn.execute(
+            "SELECT project_code, reason, created_at, task_count, payload FROM project_snapshots WHERE project_code = ?",
+            (project_code,)
+        ).fetchall()
+        conn.close()
+        
+        conn = sqlite3.connect(target.db_path)
+        conn.execute(
+            "UPDATE projects SET last_accessed_at = ? WHERE code = ?",
+            (project['last_accessed_at'], project_code)
+        )
+        conn.executemany(
+            "INSERT INTO project_snapshots (project_code, reason, created_at, task_count, payload) VALUES (?, ?, ?, ?, ?)",
+            snapshots
+        )
+        conn.commit()
+        conn.close()
+        copied += 1
+    return copied
+
+def open_database(db_path=DB_PATH):
+    """Database de arquivo único ou particionado, conforme KANBAN_SHARD_MODE"""
+    if SHARD_MODE:
+        return ShardedDatabase(SHARD_DIR, SHARD_MODE, SHARD_BUCKETS)
+    return Database(db_path)
+
+@st.cache_resource
+def get_database(db_path=DB_PATH):
+    """Instância do banco criada (e schema verificado) uma vez por processo"""
+    return open_database(db_path)
+
+# =============================================================================
+# BACKUP
+# =============================================================================
+
+def run_backup(database, backup_dir=BACKUP_DIR):
+    """Gera backup online com timestamp e aplica retenção por quantidade/idade"""
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    
+    stem = Path(database.db_path).stem
+    suffix = database.BACKUP_SUFFIX
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    dest = database.backup_to(str(backup_dir / f"{stem}_{timestamp}{suffix}"))
+    
+    # Nomes com timestamp ordenam cronologicamente
+    backups = list_backups(database, backup_dir)
+    cutoff = time.time() - BACKUP_MAX_AGE_DAYS * 86400
+    for idx, path in enumerate(backups):
+        if idx >= BACKUP_KEEP or path.stat().st_mtime < cutoff:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+    
+    return dest
+
+def list_backups(database, backup_dir=BACKUP_DIR):
+    """Lista arquivos de backup do banco, do mais recente ao mais antigo"""
+    stem = Path(database.db_path).stem
+    return sorted(Path(backup_dir).glob(f"{stem}_*{database.BACKUP_SUFFIX}"), reverse=True)
 
-# Instância global do banco
-db = Database()
+class BackupScheduler(threading.Thread):
+    """Thread que executa backups online periódicos e a limpeza de snapshots antigos"""
+    
+    def __init__(self, database, interval):
+        super().__init__(name="kanban-backup", daemon=True)
+        self.database = database
+        self.interval = interval
+        self.stop_event = threading.Event()
+    
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                logger.info("Backup criado: %s", run_backup(self.database))
+            except Exception as e:
+                logger.error("Erro no backup agendado: %s", e)
+                get_telemetry().record_error('backup.scheduled')
+            removed = self.database.prune_snapshots()
+            if removed:
+                logger.info("Snapshots antigos removidos: %d", removed)
+    
+    def stop(self):
+        self.stop_event.set()
+
+@st.cache_resource
+def get_backup_scheduler(db_path):
+    """Inicia uma única thread de backup por processo (se habilitado)"""
+    if BACKUP_INTERVAL <= 0:
+        return None
+    scheduler = BackupScheduler(get_database(db_path), BACKUP_INTERVAL)
+    scheduler.start()
+    return scheduler
 
 # =============================================================================
 # INICIALIZAÇÃO DO SESSION STATE
 # =============================================================================
 
 def init_session_state():
-    """Inicializa variáveis do session state"""
+    """Inicializa variáveis do session state e retorna o estado pesado da sessão (tarefas e metadados)"""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
     if 'project_code' not in st.session_state:
         st.session_state.project_code = None
     if 'is_admin' not in st.session_state:
         st.session_state.is_admin = False
+    if 'is_superadmin' not in st.session_state:
+        st.session_state.is_superadmin = False
     if 'current_user' not in st.session_state:
         st.session_state.current_user = None
-    if 'tasks' not in st.session_state:
-        st.session_state.tasks = []
-    if 'project_metadata' not in st.session_state:
-        st.session_state.project_metadata = {}
     if 'show_admin_panel' not in st.session_state:
         st.session_state.show_admin_panel = False
     if 'editing_task_id' not in st.session_state:
         st.session_state.editing_task_id = None
-
-init_session_state()
+    
+    registry = get_session_registry()
+    entry = registry.begin(st.session_state.session_id)
+    if entry is not None:
+        return entry
+    
+    # Sessão nova ou descartada por ociosidade: recarrega o estado pesado do banco
+    tasks, project_metadata = [], {}
+    project_code = st.session_state.project_code
+    if project_code:
+        project_data = db.load_project(project_code)
+        if project_data:
+            db.touch_project(project_code)
+            project_metadata = project_data
+            tasks = db.load_tasks(project_code)
+        else:
+            st.session_state.project_code = None
+    return registry.create(st.session_state.session_id, tasks, project_metadata)
 
 # =============================================================================
 # FUNÇÕES DE PERSISTÊNCIA
 # =============================================================================
 
-def export_to_json():
-    """Exporta projeto para JSON"""
+def build_export_json(project_code, project_metadata, tasks, task_details=None):
+    """Monta JSON de exportação do projeto e nome do arquivo"""
     data = {
-        'project_metadata': st.session_state.project_metadata,
+        'project_metadata': project_metadata,
         'columns': {
             'Backlog': [],
             'Análise': [],
@@ -304,37 +1924,88 @@ def export_to_json():
             'Testes': [],
             'Pronto': []
         },
-        'tasks': st.session_state.tasks
+        'tasks': tasks,
+        'task_details': task_details or {}
     }
     
     json_str = json.dumps(data, indent=2, ensure_ascii=False)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"kanban_project_{st.session_state.project_code}_{timestamp}.json"
+    filename = f"kanban_project_{project_code}_{timestamp}.json"
     
     return json_str, filename
 
+def export_to_json():
+    """Exporta projeto para JSON"""
+    return build_export_json(
+        st.session_state.project_code,
+        session_data['project_metadata'],
+        session_data['tasks'],
+        db.export_details(st.session_state.project_code)
+    )
+
+def store_imported_project(database, data):
+    """Valida dados de JSON exportado e grava no banco (com snapshot do estado anterior).
+    
+    Retorna o código do projeto ou None se o formato for inválido.
+    """
+    if 'project_metadata' not in data or 'tasks' not in data:
+        return None
+    if len(data['tasks']) > MAX_IMPORT_TASKS:
+        raise ValueError(f"arquivo com tarefas demais (máximo {MAX_IMPORT_TASKS})")
+    
+    project_code = data['project_metadata'].get('code')
+    
+    # Guarda o estado anterior do projeto (se existir) antes de sobrescrever
+    database.save_snapshot(project_code, 'import')
+    
+    database.save_project(project_code, data['project_metadata'])
+    database.save_tasks(project_code, data['tasks'])
+    database.import_details(project_code, data.get('task_details') or {})
+    database.purge_orphan_details(project_code)
+    return project_code
+
+@instrumented('import_from_json',
+              rows=lambda args, result: len(session_data['tasks']) if result else 0,
+              payload=lambda args, result: payload_size(args[0]))
 def import_from_json(uploaded_file):
     """Importa projeto de JSON"""
     try:
-        data = json.load(uploaded_file)
+        size = payload_size(uploaded_file)
+        if size is not None and size > MAX_JSON_UPLOAD_BYTES:
+            st.error(f"❌ Arquivo muito grande (máximo {MAX_JSON_UPLOAD_BYTES // (1024 * 1024)} MB)")
+            return False
         
-        if 'project_metadata' in data and 'tasks' in data:
-            st.session_state.project_metadata = data['project_metadata']
-            st.session_state.tasks = data['tasks']
-            st.session_state.project_code = data['project_metadata'].get('code')
+        with get_rate_limiter().heavy_slot() as acquired:
+            if not acquired:
+                st.warning("⏳ Servidor ocupado com outras importações/exportações. Tente novamente.")
+                return False
+            
+            data = json.load(uploaded_file)
             
             # Salva no banco
-            db.save_project(st.session_state.project_code, st.session_state.project_metadata)
-            db.save_tasks(st.session_state.project_code, st.session_state.tasks)
+            project_code = store_imported_project(db, data)
+            if project_code is None:
+                return False
             
+            session_data['project_metadata'] = data['project_metadata']
+            session_data['tasks'] = data['tasks']
+            st.session_state.project_code = project_code
             return True
-        return False
     except Exception as e:
-        st.error(f"Erro ao importar JSON: {e}")
+        report_error('import_from_json', f"Erro ao importar JSON: {e}")
         return False
 
+@instrumented('export_to_pdf', rows=lambda args, result: len(session_data['tasks']))
 def export_to_pdf():
     """Exporta quadro Kanban para PDF"""
+    with get_rate_limiter().heavy_slot() as acquired:
+        if not acquired:
+            st.warning("⏳ Servidor ocupado com outras importações/exportações. Tente novamente.")
+            return None
+        return _render_pdf()
+
+def _render_pdf():
+    """Desenha o quadro da sessão atual em um PDF"""
     try:
         from reportlab.lib.pagesizes import A4, landscape
         from reportlab.pdfgen import canvas
@@ -348,9 +2019,9 @@ def export_to_pdf():
         # Cabeçalho - Logo (se existir)
         y_position = page_height - 40
         
-        if st.session_state.project_metadata.get('logo_base64'):
+        if session_data['project_metadata'].get('logo_base64'):
             try:
-                logo = base64_to_image(st.session_state.project_metadata['logo_base64'])
+                logo = base64_to_image(session_data['project_metadata']['logo_base64'])
                 if logo:
                     logo_img = ImageReader(logo)
                     c.drawImage(logo_img, 30, page_height - 90, width=60, height=60, preserveAspectRatio=True, mask='auto')
@@ -359,13 +2030,13 @@ def export_to_pdf():
         
         # Título do Projeto
         c.setFont("Helvetica-Bold", 18)
-        c.drawString(110, page_height - 50, st.session_state.project_metadata.get('title', 'Kanban Board'))
+        c.drawString(110, page_height - 50, session_data['project_metadata'].get('title', 'Kanban Board'))
         
         # Informações do projeto (código, data, admin)
         c.setFont("Helvetica", 10)
         c.drawString(110, page_height - 70, f"Código: {st.session_state.project_code}")
-        c.drawString(250, page_height - 70, f"Criado: {format_datetime(st.session_state.project_metadata.get('created_at', ''))}")
-        c.drawString(420, page_height - 70, f"Admin: {st.session_state.project_metadata.get('admin_name', '')}")
+        c.drawString(250, page_height - 70, f"Criado: {format_datetime(session_data['project_metadata'].get('created_at', ''))}")
+        c.drawString(420, page_height - 70, f"Admin: {session_data['project_metadata'].get('admin_name', '')}")
         
         # Linha separadora
         c.line(30, page_height - 100, page_width - 30, page_height - 100)
@@ -391,7 +2062,7 @@ def export_to_pdf():
             c.drawString(x + 10, y_start, col)
             
             # Tarefas da coluna
-            col_tasks = [t for t in st.session_state.tasks if t['column'] == col]
+            col_tasks = column_tasks_sorted(session_data['tasks'], col)
             y_task = y_start - 30
             
             for task in col_tasks:
@@ -475,7 +2146,7 @@ def export_to_pdf():
         return buffer
         
     except Exception as e:
-        st.error(f"Erro ao gerar PDF: {e}")
+        report_error('export_to_pdf', f"Erro ao gerar PDF: {e}")
         return None
 
 # =============================================================================
@@ -489,9 +2160,10 @@ def render_header():
         
         with col1:
             # Logo
-            if st.session_state.project_metadata.get('logo_base64'):
+            if session_data['project_metadata'].get('logo_base64'):
                 try:
-                    logo = base64_to_image(st.session_state.project_metadata['logo_base64'])
+                    # st.image aceita os bytes do PNG diretamente, sem decodificar com PIL
+                    logo = base64_to_bytes(session_data['project_metadata']['logo_base64'])
                     if logo:
                         st.image(logo, width=100)
                 except:
@@ -502,42 +2174,98 @@ def render_header():
             if st.session_state.is_admin:
                 new_title = st.text_input(
                     "Título do Projeto",
-                    value=st.session_state.project_metadata.get('title', 'Meu Projeto Kanban'),
+                    value=session_data['project_metadata'].get('title', 'Meu Projeto Kanban'),
                     key="project_title"
                 )
-                if new_title != st.session_state.project_metadata.get('title'):
-                    st.session_state.project_metadata['title'] = new_title
-                    db.save_project(st.session_state.project_code, st.session_state.project_metadata)
+                if new_title != session_data['project_metadata'].get('title'):
+                    session_data['project_metadata']['title'] = new_title
+                    db.save_project(st.session_state.project_code, session_data['project_metadata'])
             else:
-                st.markdown(f"### {st.session_state.project_metadata.get('title', 'Meu Projeto Kanban')}")
+                st.markdown(f"### {session_data['project_metadata'].get('title', 'Meu Projeto Kanban')}")
             
             # Informações
-            created = format_datetime(st.session_state.project_metadata.get('created_at', ''))
+            created = format_datetime(session_data['project_metadata'].get('created_at', ''))
             st.caption(f"📅 Criado em: {created} | 🔑 Código: **{st.session_state.project_code}** | 👤 {st.session_state.current_user}")
         
         with col3:
             pass
 
-def render_post_it(task, column):
-    """Renderiza um post-it"""
+# Quantidade máxima de post-its renderizados mantidos em cache
+POST_IT_CACHE_SIZE = int(os.getenv('KANBAN_POST_IT_CACHE_SIZE', '5000'))
+# Campos usados por build_post_it_html; todos entram na chave do cache, pois
+# restaurações e importações gravam cards com updated_at antigo
+POST_IT_FIELDS = ('id', 'content', 'color', 'owner', 'created_at', 'updated_at',
+                  'has_description', 'checklist_total', 'checklist_done', 'comment_count')
+
+class RenderCache:
+    """Cache LRU limitado de HTML já montado, compartilhado entre sessões"""
+    
+    def __init__(self, max_size=POST_IT_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_build(self, key, build):
+        """Retorna HTML em cache para `key` ou monta com `build()` e guarda"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        
+        markup = build()
+        with self.lock:
+            self.entries[key] = markup
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return markup
+
+@st.cache_resource
+def get_post_it_cache():
+    """Cache de post-its único por processo"""
+    return RenderCache()
+
+def build_post_it_html(task):
+    """Monta HTML do post-it com conteúdo escapado"""
+    bg_color = html.escape(task['color'])
+    content = html.escape(task['content'])
+    owner = html.escape(task['owner'] or '')
     
-    bg_color = task['color']
-    content = task['content'].replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
-    owner = task['owner'].replace('<', '&lt;').replace('>', '&gt;')
+    # Resumo dos detalhes (o conteúdo em si só é carregado ao abrir o card)
+    summary = []
+    if task.get('has_description'):
+        summary.append("📝")
+    if task.get('checklist_total'):
+        summary.append(f"☑️ {task['checklist_done']}/{task['checklist_total']}")
+    if task.get('comment_count'):
+        summary.append(f"💬 {task['comment_count']}")
+    summary_html = f"<br>{' · '.join(summary)}" if summary else ""
     
     # Container do post-it com todo o conteúdo dentro
-    post_it_html = f"""
+    return f"""
     <div class="post-it" style="background-color: {bg_color};">
         <div class="task-meta">
             👤 {owner}<br>
             📅 Criado: {format_datetime(task['created_at'])}<br>
-            ✏️ Editado: {format_datetime(task['updated_at'])}
+            ✏️ Editado: {format_datetime(task['updated_at'])}{summary_html}
         </div>
         <div style="margin-top: 10px; font-weight: bold; font-size: 16px; color: #333; word-wrap: break-word;">
             {content}
         </div>
     </div>
     """
+
+def render_post_it(task, column, post_it_cache):
+    """Renderiza um post-it"""
+    
+    post_it_html = post_it_cache.get_or_build(
+        tuple(task.get(field) for field in POST_IT_FIELDS),
+        lambda: build_post_it_html(task)
+    )
     
     st.markdown(post_it_html, unsafe_allow_html=True)
     
@@ -555,10 +2283,13 @@ def render_post_it(task, column):
             label_visibility="collapsed"
         )
         
-        if move_to != 'Mover ↔':
+        if move_to != 'Mover ↔' and allow_action('move'):
+            # Entra no fim da coluna de destino
+            dest_tasks = column_tasks_sorted(session_data['tasks'], move_to)
+            task['rank'] = rank_between(dest_tasks[-1]['rank'] if dest_tasks else None, None)
             task['column'] = move_to
             task['updated_at'] = datetime.now().isoformat()
-            db.save_tasks(st.session_state.project_code, st.session_state.tasks)
+            db.update_task_position(st.session_state.project_code, task)
             st.rerun()
     
     with col2:
@@ -571,17 +2302,83 @@ def render_post_it(task, column):
     with col3:
         # Deletar (apenas dono ou admin)
         can_delete = st.session_state.is_admin or task['owner'] == st.session_state.current_user
-        if can_delete and st.button("🗑️", key=f"del_{task['id']}"):
-            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-            db.save_tasks(st.session_state.project_code, st.session_state.tasks)
+        if can_delete and st.button("🗑️", key=f"del_{task['id']}") and allow_action('delete'):
+            session_data['tasks'] = [t for t in session_data['tasks'] if t['id'] != task['id']]
+            db.save_tasks(st.session_state.project_code, session_data['tasks'])
+            db.purge_orphan_details(st.session_state.project_code)
+            st.rerun()
+    
+    # Reordenação dentro da coluna
+    col1, col2, col3 = st.columns(3)
+    for col, direction, label, help_text in (
+        (col1, 'top', "⏫", "Mover para o topo"),
+        (col2, 'up', "⬆️", "Subir"),
+        (col3, 'down', "⬇️", "Descer")
+    ):
+        with col:
+            if st.button(label, key=f"{direction}_{task['id']}", help=help_text) and allow_action('reorder'):
+                changed = move_task_in_column(session_data['tasks'], task, direction)
+                for changed_task in changed:
+                    db.update_task_position(st.session_state.project_code, changed_task)
+                if changed:
+                    st.rerun()
+    
+    st.markdown("---")
+
+def render_task_details(task, details):
+    """Renderiza checklist e comentários do card em edição"""
+    project_code = st.session_state.project_code
+    
+    # Mantém o resumo do card em sincronia com os detalhes recém-carregados
+    task['comment_count'] = len(details['comments'])
+    task['checklist_total'] = len(details['checklist'])
+    task['checklist_done'] = sum(1 for item in details['checklist'] if item['done'])
+    
+    def touch():
+        task['updated_at'] = datetime.now().isoformat()
+        return task['updated_at']
+    
+    # Checklist
+    st.markdown("**☑️ Checklist**")
+    for item in details['checklist']:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            done = st.checkbox(item['text'], value=item['done'], key=f"check_{item['id']}")
+        if done != item['done'] and allow_action('checklist'):
+            db.set_checklist_item(project_code, task['id'], item['id'], done, touch())
+            st.rerun()
+        with col2:
+            if st.button("✖", key=f"del_check_{item['id']}", help="Remover item") and allow_action('checklist'):
+                db.delete_checklist_item(project_code, task['id'], item['id'], touch())
+                st.rerun()
+    
+    with st.form(key=f"checklist_form_{task['id']}", clear_on_submit=True):
+        item_text = st.text_input("Novo item")
+        if st.form_submit_button("➕ Adicionar") and item_text.strip() and allow_action('checklist'):
+            db.add_checklist_item(project_code, task['id'], item_text.strip(), touch())
+            st.rerun()
+    
+    # Comentários
+    st.markdown("**💬 Comentários**")
+    for comment in details['comments']:
+        st.caption(f"👤 {comment['author']} · 📅 {format_datetime(comment['created_at'])}")
+        st.text(comment['content'])
+    
+    with st.form(key=f"comment_form_{task['id']}", clear_on_submit=True):
+        comment_text = st.text_area("Novo comentário", height=80)
+        if st.form_submit_button("💬 Comentar") and comment_text.strip() and allow_action('comment'):
+            db.add_comment(project_code, task['id'], st.session_state.current_user, comment_text.strip(), touch())
             st.rerun()
     
     st.markdown("---")
 
+@instrumented('render_kanban_board', rows=lambda args, result: len(session_data['tasks']))
 def render_kanban_board():
     """Renderiza o quadro Kanban completo"""
     columns = ['Backlog', 'Análise', 'Desenvolvimento', 'Testes', 'Pronto']
     cols = st.columns(5)
+    # Obtido uma vez por renderização, não por card
+    post_it_cache = get_post_it_cache()
     
     for idx, column in enumerate(columns):
         with cols[idx]:
@@ -599,7 +2396,7 @@ def render_kanban_board():
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.form_submit_button("✅ Criar"):
+                        if st.form_submit_button("✅ Criar") and allow_action('create'):
                             color_map = {
                                 'Amarelo': '#FFF59D',
                                 'Rosa': '#F8BBD0',
@@ -608,6 +2405,7 @@ def render_kanban_board():
                                 'Laranja': '#FFCC80'
                             }
                             
+                            col_tasks = column_tasks_sorted(session_data['tasks'], column)
                             new_task = {
                                 'id': str(uuid.uuid4()),
                                 'content': content,
@@ -615,13 +2413,14 @@ def render_kanban_board():
                                 'owner': st.session_state.current_user,
                                 'column': column,
                                 'created_at': datetime.now().isoformat(),
-                                'updated_at': datetime.now().isoformat()
+                                'updated_at': datetime.now().isoformat(),
+                                'rank': rank_between(col_tasks[-1]['rank'] if col_tasks else None, None)
                             }
                             
-                            st.session_state.tasks.append(new_task)
-                            db.save_tasks(st.session_state.project_code, st.session_state.tasks)
+                            session_data['tasks'].append(new_task)
+                            db.save_tasks(st.session_state.project_code, session_data['tasks'])
                             # Recarrega do banco para garantir sincronização
-                            st.session_state.tasks = db.load_tasks(st.session_state.project_code)
+                            session_data['tasks'] = db.load_tasks(st.session_state.project_code)
                             st.session_state[f'creating_in_{column}'] = False
                             st.rerun()
                     
@@ -631,13 +2430,15 @@ def render_kanban_board():
                             st.rerun()
             
             # Tarefas da coluna
-            column_tasks = [t for t in st.session_state.tasks if t['column'] == column]
+            column_tasks = column_tasks_sorted(session_data['tasks'], column)
             
             for task in column_tasks:
                 if st.session_state.editing_task_id == task['id']:
-                    # Modo de edição
+                    # Modo de edição: detalhes do card carregados só agora
+                    details = db.load_task_details(st.session_state.project_code, task['id'])
                     with st.form(key=f"edit_form_{task['id']}"):
                         new_content = st.text_area("Editar conteúdo", value=task['content'], height=100)
+                        new_description = st.text_area("Descrição", value=details['description'], height=150)
                         color_options = ['Amarelo', 'Rosa', 'Verde', 'Azul', 'Laranja']
                         color_map = {
                             '#FFF59D': 'Amarelo',
@@ -651,7 +2452,7 @@ def render_kanban_board():
                         
                         col1, col2 = st.columns(2)
                         with col1:
-                            if st.form_submit_button("💾 Salvar"):
+                            if st.form_submit_button("💾 Salvar") and allow_action('edit'):
                                 color_map_reverse = {
                                     'Amarelo': '#FFF59D',
                                     'Rosa': '#F8BBD0',
@@ -662,7 +2463,13 @@ def render_kanban_board():
                                 task['content'] = new_content
                                 task['color'] = color_map_reverse[new_color]
                                 task['updated_at'] = datetime.now().isoformat()
-                                db.save_tasks(st.session_state.project_code, st.session_state.tasks)
+                                db.save_tasks(st.session_state.project_code, session_data['tasks'])
+                                if new_description != details['description']:
+                                    db.save_task_description(
+                                        st.session_state.project_code, task['id'],
+                                        new_description, task['updated_at']
+                                    )
+                                    task['has_description'] = bool(new_description)
                                 st.session_state.editing_task_id = None
                                 st.rerun()
                         
@@ -670,13 +2477,67 @@ def render_kanban_board():
                             if st.form_submit_button("❌ Cancelar"):
                                 st.session_state.editing_task_id = None
                                 st.rerun()
+                    
+                    render_task_details(task, details)
                 else:
-                    render_post_it(task, column)
+                    render_post_it(task, column, post_it_cache)
 
 # =============================================================================
 # SIDEBAR
 # =============================================================================
 
+def render_metrics_panel():
+    """Renderiza painel de desempenho (apenas admin)"""
+    telemetry = get_telemetry()
+    with st.expander("📊 Desempenho"):
+        summary = telemetry.snapshot()
+        if summary:
+            st.dataframe(
+                [{
+                    'Operação': item['operation'],
+                    'Chamadas': item['count'],
+                    'Erros': item['errors'],
+                    'p50 (ms)': round(item['p50_ms'], 1),
+                    'p95 (ms)': round(item['p95_ms'], 1),
+                    'p99 (ms)': round(item['p99_ms'], 1),
+                    'Máx (ms)': round(item['max_ms'], 1),
+                    'Linhas': item['rows'],
+                    'Bytes': item['bytes']
+                } for item in summary],
+                hide_index=True
+            )
+        else:
+            st.caption("Nenhuma métrica coletada ainda.")
+        st.caption(f"Limite de operação lenta: {SLOW_OPERATION_MS:.0f} ms")
+        
+        post_it_cache = get_post_it_cache()
+        lookups = post_it_cache.hits + post_it_cache.misses
+        hit_rate = 100 * post_it_cache.hits / lookups if lookups else 0
+        st.caption(f"Cache de post-its: {len(post_it_cache.entries)} itens, {hit_rate:.0f}% de acertos")
+        
+        sessions = get_session_registry().stats()
+        st.caption(
+            f"Sessões: {sessions['sessions']} · "
+            f"memória ≈ {sessions['bytes'] / (1024 * 1024):.1f} de {sessions['budget'] / (1024 * 1024):.0f} MB · "
+            f"maior sessão ≈ {sessions['largest'] / 1024:.0f} KB · descartes: {sessions['evictions']}"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("💾 Gravar métricas", key="dump_metrics_btn"):
+                try:
+                    st.toast(f"✅ Métricas gravadas em {telemetry.dump()}")
+                except OSError as e:
+                    report_error('metrics.dump', f"Erro ao gravar métricas: {e}")
+        with col2:
+            st.download_button(
+                label="⬇️ Prometheus",
+                data=telemetry.to_prometheus(),
+                file_name="kanban_metrics.prom",
+                mime="text/plain",
+                key="download_metrics_btn"
+            )
+
 def render_sidebar():
     """Renderiza sidebar com opções"""
     with st.sidebar:
@@ -693,8 +2554,8 @@ def render_sidebar():
                     st.session_state.show_admin_panel = not st.session_state.show_admin_panel
             
             with col2:
-                if st.button("🔄", help="Atualizar tarefas", key="refresh_btn"):
-                    st.session_state.tasks = db.load_tasks(st.session_state.project_code)
+                if st.button("🔄", help="Atualizar tarefas", key="refresh_btn") and allow_action('refresh'):
+                    session_data['tasks'] = db.load_tasks(st.session_state.project_code)
                     st.toast("✅ Atualizado!", icon="✅")
                     st.rerun()
             
@@ -703,6 +2564,8 @@ def render_sidebar():
                 if st.button("Entrar como Admin"):
                     if password == get_admin_password():
                         st.session_state.is_admin = True
+                        # Controles do processo inteiro (métricas, backup) exigem a senha de admin
+                        st.session_state.is_superadmin = True
                         st.success("✅ Acesso de administrador concedido!")
                         st.session_state.show_admin_panel = False
                         st.rerun()
@@ -715,6 +2578,8 @@ def render_sidebar():
             
             if st.session_state.is_admin:
                 st.success("🔓 Modo Administrador")
+            if st.session_state.is_superadmin:
+                render_metrics_panel()
             
             st.markdown("---")
             
@@ -739,9 +2604,15 @@ def render_sidebar():
                 file_id = f"{uploaded_json.name}_{uploaded_json.size}_{uploaded_json.file_id if hasattr(uploaded_json, 'file_id') else ''}"
                 
                 # Se não existe last_json_id ou é um arquivo diferente, processa
-                if 'last_json_id' not in st.session_state or st.session_state.get('last_json_id') != file_id:
+                is_new_file = 'last_json_id' not in st.session_state or st.session_state.get('last_json_id') != file_id
+                if is_new_file and uploaded_json.size > MAX_JSON_UPLOAD_BYTES:
+                    # Rejeitado antes de consumir o limite de operações pesadas
+                    st.session_state.last_json_id = file_id
+                    st.error(f"❌ Arquivo muito grande (máximo {MAX_JSON_UPLOAD_BYTES // (1024 * 1024)} MB)")
+                elif is_new_file and allow_action('import_json', heavy=True):
+                    # Cada arquivo é processado uma única vez, com sucesso ou não
+                    st.session_state.last_json_id = file_id
                     if import_from_json(uploaded_json):
-                        st.session_state.last_json_id = file_id
                         st.session_state.json_loaded = True
                         st.success("✅ Projeto carregado com sucesso!")
                     else:
@@ -754,7 +2625,7 @@ def render_sidebar():
                     st.rerun()
             
             # Exportar PDF
-            if st.button("📄 Exportar PDF"):
+            if st.button("📄 Exportar PDF") and allow_action('export_pdf', heavy=True):
                 pdf_buffer = export_to_pdf()
                 if pdf_buffer:
                     st.download_button(
@@ -774,16 +2645,50 @@ def render_sidebar():
                 
                 # Botão só funciona se checkbox estiver marcado
                 if st.button("🗑️ Limpar Projeto", type="secondary", disabled=not confirmar):
-                    st.session_state.tasks = []
-                    db.save_tasks(st.session_state.project_code, st.session_state.tasks)
+                    db.save_snapshot(st.session_state.project_code, 'clear')
+                    session_data['tasks'] = []
+                    db.save_tasks(st.session_state.project_code, session_data['tasks'])
+                    db.purge_orphan_details(st.session_state.project_code)
                     # Reseta variáveis de controle do JSON para permitir novo upload
                     if 'last_json_id' in st.session_state:
                         del st.session_state.last_json_id
                     if 'json_loaded' in st.session_state:
                         del st.session_state.json_loaded
-                    st.success("✅ Projeto limpo com sucesso!")
-                    time.sleep(1)
+                    st.toast("✅ Projeto limpo com sucesso!")
                     st.rerun()
+                
+                # Snapshots automáticos (tirados antes de limpar/importar)
+                st.markdown("#### ⏪ Snapshots")
+                snapshots = db.list_snapshots(st.session_state.project_code)
+                if snapshots:
+                    reason_labels = {'clear': 'limpeza', 'import': 'importação', 'restore': 'restauração'}
+                    snapshot = st.selectbox(
+                        "Estado anterior a",
+                        snapshots,
+                        format_func=lambda snap: f"{format_datetime(snap['created_at'])} · {reason_labels.get(snap['reason'], snap['reason'])} ({snap['task_count']} tarefas)",
+                        key="snapshot_select"
+                    )
+                    if st.button("⏪ Restaurar Snapshot", key="restore_snapshot_btn"):
+                        data = db.restore_snapshot(st.session_state.project_code, snapshot['id'])
+                        if data:
+                            session_data['project_metadata'] = data['project_metadata']
+                            session_data['tasks'] = data['tasks']
+                            st.toast("✅ Snapshot restaurado!")
+                            st.rerun()
+                else:
+                    st.caption("Nenhum snapshot disponível.")
+                
+                # Backup online do banco inteiro (somente com a senha de admin)
+                if st.session_state.is_superadmin:
+                    if st.button("💾 Backup do Banco", key="backup_now_btn") and allow_action('backup', heavy=True):
+                        with get_rate_limiter().heavy_slot() as acquired:
+                            if not acquired:
+                                st.warning("⏳ Servidor ocupado com outras importações/exportações. Tente novamente.")
+                            else:
+                                try:
+                                    st.success(f"✅ Backup criado: {run_backup(db)}")
+                                except Exception as e:
+                                    report_error('backup.manual', f"Erro ao criar backup: {e}")
             
             # Upload de logo (admin)
             if st.session_state.is_admin:
@@ -793,20 +2698,23 @@ def render_sidebar():
                 if logo_file:
                     # Verifica se é um novo arquivo
                     file_id = f"{logo_file.name}_{logo_file.size}"
-                    if st.session_state.get('last_logo_id') != file_id:
+                    if logo_file.size > MAX_LOGO_UPLOAD_BYTES:
+                        st.error(f"❌ Logo muito grande (máximo {MAX_LOGO_UPLOAD_BYTES // (1024 * 1024)} MB)")
+                    elif st.session_state.get('last_logo_id') != file_id:
+                        from PIL import Image
                         image = Image.open(logo_file)
                         # Redimensiona para 200x200
                         image.thumbnail((200, 200))
-                        st.session_state.project_metadata['logo_base64'] = f"data:image/png;base64,{image_to_base64(image)}"
-                        db.save_project(st.session_state.project_code, st.session_state.project_metadata)
+                        session_data['project_metadata']['logo_base64'] = f"data:image/png;base64,{image_to_base64(image)}"
+                        db.save_project(st.session_state.project_code, session_data['project_metadata'])
                         st.session_state.last_logo_id = file_id
                         st.success("✅ Logo atualizado com sucesso!")
-                        time.sleep(0.5)
 
 # =============================================================================
 # FLUXO PRINCIPAL
 # =============================================================================
 
+@instrumented('rerun')
 def main():
     """Fluxo principal da aplicação"""
     
@@ -821,30 +2729,29 @@ def main():
             admin_name = st.text_input("Seu nome (Administrador)")
             project_title = st.text_input("Título do projeto", value="Meu Projeto Kanban")
             
-            if st.button("✨ Criar Projeto", type="primary"):
+            if st.button("✨ Criar Projeto", type="primary") and allow_action('create_project'):
                 if admin_name:
-                    # Gera código único
-                    project_code = generate_project_code()
-                    
-                    # Configura metadados
-                    st.session_state.project_code = project_code
-                    st.session_state.is_admin = True
-                    st.session_state.current_user = admin_name
-                    st.session_state.project_metadata = {
-                        'code': project_code,
+                    # Salva no banco com código único sorteado
+                    project_metadata = {
                         'title': project_title,
                         'admin_name': admin_name,
                         'created_at': datetime.now().isoformat(),
                         'logo_base64': ''
                     }
-                    st.session_state.tasks = []
+                    project_code = db.allocate_project(project_metadata)
+                    if not project_code:
+                        st.stop()
                     
-                    # Salva no banco
-                    db.save_project(project_code, st.session_state.project_metadata)
+                    # Configura metadados
+                    st.session_state.project_code = project_code
+                    st.session_state.is_admin = True
+                    st.session_state.current_user = admin_name
+                    session_data['project_metadata'] = {'code': project_code, **project_metadata}
+                    session_data['tasks'] = []
                     
-                    st.success(f"🎉 Projeto criado! Código: **{project_code}**")
-                    st.info("💡 Compartilhe este código com sua equipe!")
-                    time.sleep(2)
+                    # Confirmações em toast sobrevivem ao rerun sem pausar o script
+                    st.toast(f"🎉 Projeto criado! Código: **{project_code}**")
+                    st.toast("💡 Compartilhe este código com sua equipe!")
                     st.rerun()
                 else:
                     st.error("Por favor, informe seu nome.")
@@ -854,20 +2761,20 @@ def main():
             access_code = st.text_input("Código do projeto (8 dígitos)")
             user_name = st.text_input("Seu nome")
             
-            if st.button("🚀 Entrar no Projeto", type="primary"):
+            if st.button("🚀 Entrar no Projeto", type="primary") and allow_action('login'):
                 if access_code and user_name:
                     # Tenta carregar projeto
                     project_data = db.load_project(access_code)
                     
                     if project_data:
+                        db.touch_project(access_code)
                         st.session_state.project_code = access_code
                         st.session_state.current_user = user_name
                         st.session_state.is_admin = False
-                        st.session_state.project_metadata = project_data
-                        st.session_state.tasks = db.load_tasks(access_code)
+                        session_data['project_metadata'] = project_data
+                        session_data['tasks'] = db.load_tasks(access_code)
                         
-                        st.success(f"✅ Bem-vindo ao projeto: {project_data['title']}")
-                        time.sleep(1)
+                        st.toast(f"✅ Bem-vindo ao projeto: {project_data['title']}")
                         st.rerun()
                     else:
                         st.error("❌ Código de projeto inválido!")
@@ -889,49 +2796,14 @@ def main():
         st.caption("📋 Kanban App! | por Ary Ribeiro: aryribeiro@gmail.com")
 
 if __name__ == "__main__":
-    main()
-
-st.markdown("""
-<style>
-    .main {
-        background-color: #ffffff;
-        color: #333333;
-    }
-    .block-container {
-        padding-top: 1rem;
-        padding-bottom: 0rem;
-    }
-    /* Esconde o menu principal e footer, MAS mantém o botão do sidebar */
-    #MainMenu {visibility: hidden !important;}
-    footer {visibility: hidden !important;}
-    
-    /* Mantém o botão de toggle do sidebar visível */
-    button[kind="header"] {
-        display: block !important;
-        visibility: visible !important;
-    }
-    
-    /* Remove qualquer espaço em branco adicional */
-    div[data-testid="stAppViewBlockContainer"] {
-        padding-top: 0 !important;
-        padding-bottom: 0 !important;
-    }
-    div[data-testid="stVerticalBlock"] {
-        gap: 0 !important;
-        padding-top: 0 !important;
-        padding-bottom: 0 !important;
-    }
-    /* Remove quaisquer margens extras */
-    .element-container {
-        margin-top: 0 !important;
-        margin-bottom: 0 !important;
-    }
-    
-    /* Garante que o header com o botão do sidebar fique visível */
-    header[data-testid="stHeader"] {
-        display: block !important;
-        visibility: visible !important;
-        background-color: transparent !important;
-    }
-</style>
-""", unsafe_allow_html=True)
\ No newline at end of file
+    setup_page()
+    # Banco compartilhado pelas sessões do processo
+    db = get_database()
+    # Tarefas e metadados da sessão (guardados no registro de sessões do processo)
+    session_data = init_session_state()
+    get_backup_scheduler(db.db_path)
+    try:
+        main()
+    finally:
+        end_session_run()
+        get_telemetry().maybe_dump()
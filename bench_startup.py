@@ -0,0 +1,87 @@
+"""Benchmark de inicialização do Kanban App!
+
+Mede, contra um banco temporário:
+- tempo de importação do módulo `app` em processos novos (cold start);
+- tempo da primeira renderização (tela de login) com o AppTest do Streamlit;
+- tempo das renderizações seguintes (reruns com recursos já em cache).
+
+Uso:
+    python bench_startup.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+APP_FILE = APP_DIR / "app.py"
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import streamlit
+mid = time.perf_counter()
+import app
+end = time.perf_counter()
+print(mid - start, end - mid)
+"""
+
+def measure_imports(runs, env):
+    """Importa streamlit e app em processos novos e retorna os tempos (s)"""
+    streamlit_times, app_times = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        streamlit_times.append(float(output[-2]))
+        app_times.append(float(output[-1]))
+    return streamlit_times, app_times
+
+def measure_renders(runs):
+    """Mede primeira renderização e reruns com o AppTest"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_FILE), default_timeout=60)
+    start = time.perf_counter()
+    at.run()
+    first_paint = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+    reruns = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - start)
+    return first_paint, reruns
+
+def report(label, values):
+    """Imprime mediana e máximo em ms"""
+    values_ms = [v * 1000 for v in values]
+    print(f"{label:<28} mediana {statistics.median(values_ms):8.1f} ms   máx {max(values_ms):8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do Kanban App!")
+    parser.add_argument('--runs', type=int, default=5, help="Repetições de cada medição")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, KANBAN_DB_PATH=str(Path(tmp_dir) / "bench.db"), STREAMLIT_LOGGER_LEVEL="error")
+        os.environ.update(env)
+
+        streamlit_times, app_times = measure_imports(args.runs, env)
+        first_paint, reruns = measure_renders(args.runs)
+
+    report("import streamlit", streamlit_times)
+    report("import app", app_times)
+    report("primeira renderização", [first_paint])
+    report("reruns", reruns)
+
+if __name__ == "__main__":
+    main()
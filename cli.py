@@ -0,0 +1,323 @@
+"""Ferramenta de linha de comando para administração em lote do Kanban App!
+
+Exemplos:
+    python cli.py projects
+    python cli.py create --admin Ana --title "Sprint 1" --count 3
+    python cli.py move --all --from Testes --to Pronto
+    python cli.py purge --older-than 180 --dry-run
+    python cli.py archive --inactive-for 90 --out arquivados
+    python cli.py export --all --out exports --workers 8
+    python cli.py import exports/*.json
+    python cli.py backup
+    python cli.py split --shard-dir shards --mode hash --buckets 16
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import streamlit.logger
+
+# Fora do `streamlit run` não há contexto de script; silencia os avisos do modo bare
+streamlit.logger.set_log_level("error")
+
+from app import (
+    Database,
+    ShardedDatabase,
+    build_export_json,
+    list_backups,
+    open_database,
+    run_backup,
+    split_into_shards,
+    store_imported_project,
+    BACKUP_DIR,
+    DB_PATH,
+    SHARD_BUCKETS,
+    SHARD_DIR,
+    SNAPSHOT_MAX_AGE_DAYS,
+)
+
+COLUMNS = ['Backlog', 'Análise', 'Desenvolvimento', 'Testes', 'Pronto']
+
+# =============================================================================
+# FUNÇÕES AUXILIARES
+# =============================================================================
+
+def resolve_projects(database, args):
+    """Retorna códigos de projeto selecionados por --project ou --all"""
+    if args.all:
+        return [p['code'] for p in database.list_projects()]
+    
+    # Valida todos os códigos informados com uma única busca em lote
+    found = database.lookup_projects(args.project or [])
+    for project_code in args.project or []:
+        if project_code not in found:
+            print(f"{project_code}: projeto não encontrado", file=sys.stderr)
+    return [code for code in dict.fromkeys(args.project or []) if code in found]
+
+def export_project(database, project_code, out_dir):
+    """Exporta um projeto para arquivo JSON no formato do app"""
+    project = database.load_project(project_code)
+    if not project:
+        raise LookupError(f"projeto {project_code} não encontrado")
+    tasks = database.load_tasks(project_code)
+
+    json_str, filename = build_export_json(project_code, project, tasks, database.export_details(project_code))
+    path = Path(out_dir) / filename
+    path.write_text(json_str, encoding='utf-8')
+    return path, len(tasks)
+
+# =============================================================================
+# COMANDOS
+# =============================================================================
+
+def cmd_projects(database, args):
+    """Lista projetos"""
+    for project in database.list_projects():
+        print(f"{project['code']}\t{project['created_at']}\t{project['last_accessed_at']}\t"
+              f"{project['task_count']} tarefas\t{project['admin_name']}\t{project['title']}")
+    return 0
+
+def cmd_create(database, args):
+    """Cria projetos novos"""
+    for _ in range(args.count):
+        metadata = {
+            'title': args.title,
+            'admin_name': args.admin,
+            'created_at': datetime.now().isoformat(),
+            'logo_base64': ''
+        }
+        project_code = database.allocate_project(metadata)
+        if not project_code:
+            return 1
+        print(project_code)
+    return 0
+
+def cmd_move(database, args):
+    """Move todas as tarefas de uma coluna para outra nos projetos selecionados"""
+    total = 0
+    for project_code in resolve_projects(database, args):
+        moved = database.move_column_tasks(project_code, args.from_column, args.to_column)
+        if moved:
+            print(f"{project_code}: {moved} tarefas movidas")
+        total += moved
+    print(f"Total: {total} tarefas movidas")
+    return 0
+
+def cmd_purge(database, args):
+    """Remove projetos criados há mais de N dias"""
+    cutoff = (datetime.now() - timedelta(days=args.older_than)).isoformat()
+    old_projects = [p for p in database.list_projects() if (p['created_at'] or '') < cutoff]
+
+    for project in old_projects:
+        if args.dry_run:
+            print(f"{project['code']}: seria removido ({project['task_count']} tarefas)")
+        elif database.delete_project(project['code']):
+            print(f"{project['code']}: removido ({project['task_count']} tarefas)")
+        else:
+            return 1
+    print(f"Total: {len(old_projects)} projetos")
+    return 0
+
+def cmd_archive(database, args):
+    """Exporta para JSON e remove projetos sem acesso há mais de N dias"""
+    cutoff = (datetime.now() - timedelta(days=args.inactive_for)).isoformat()
+    inactive = database.list_inactive_projects(cutoff)
+    out_dir = Path(args.out)
+    if not args.dry_run:
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+    for project in inactive:
+        if args.dry_run:
+            print(f"{project['code']}: seria arquivado (último acesso {project['last_accessed_at']})")
+            continue
+        path, task_count = export_project(database, project['code'], out_dir)
+        # O JSON exportado é o arquivo; nada do projeto fica no banco
+        if not database.delete_project(project['code'], keep_snapshots=False):
+            return 1
+        print(f"{project['code']}: arquivado em {path} ({task_count} tarefas)")
+    print(f"Total: {len(inactive)} projetos")
+    return 0
+
+def cmd_export(database, args):
+    """Exporta projetos para JSON em paralelo"""
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(export_project, database, project_code, out_dir): project_code
+            for project_code in resolve_projects(database, args)
+        }
+        for future in as_completed(futures):
+            try:
+                path, task_count = future.result()
+                print(f"{futures[future]}: {path} ({task_count} tarefas)")
+            except Exception as e:
+                failures += 1
+                print(f"{futures[future]}: erro ao exportar: {e}", file=sys.stderr)
+    return 1 if failures else 0
+
+def cmd_import(database, args):
+    """Importa arquivos JSON exportados pelo app"""
+    failures = 0
+    for file_path in args.files:
+        try:
+            with open(file_path, encoding='utf-8') as f:
+                project_code = store_imported_project(database, json.load(f))
+            if project_code is None:
+                raise ValueError("formato inválido")
+            print(f"{file_path}: importado como {project_code}")
+        except Exception as e:
+            failures += 1
+            print(f"{file_path}: erro ao importar: {e}", file=sys.stderr)
+    return 1 if failures else 0
+
+def cmd_backup(database, args):
+    """Gera backup online do banco"""
+    print(run_backup(database, args.dir))
+    return 0
+
+def cmd_backups(database, args):
+    """Lista backups disponíveis"""
+    for path in list_backups(database, args.dir):
+        print(path)
+    return 0
+
+def cmd_restore_backup(database, args):
+    """Restaura o banco inteiro a partir de um arquivo de backup"""
+    database.restore_from(args.file)
+    print(f"Banco restaurado de {args.file}")
+    return 0
+
+def cmd_snapshots(database, args):
+    """Lista snapshots de um projeto"""
+    for snapshot in database.list_snapshots(args.project_code):
+        print(f"{snapshot['id']}\t{snapshot['created_at']}\t{snapshot['reason']}\t{snapshot['task_count']} tarefas")
+    return 0
+
+def cmd_restore_snapshot(database, args):
+    """Restaura um projeto a partir de um snapshot"""
+    data = database.restore_snapshot(args.project_code, args.snapshot_id)
+    if not data:
+        print(f"Snapshot {args.snapshot_id} não encontrado para {args.project_code}", file=sys.stderr)
+        return 1
+    print(f"{args.project_code}: restaurado ({len(data['tasks'])} tarefas)")
+    return 0
+
+def cmd_prune_snapshots(database, args):
+    """Remove snapshots antigos de todos os projetos (inclusive removidos/arquivados)"""
+    print(f"{database.prune_snapshots(args.max_age_days)} snapshots removidos")
+    return 0
+
+def cmd_split(database, args):
+    """Divide um banco de arquivo único em shards"""
+    if not isinstance(database, Database):
+        print("O banco de origem já está particionado (KANBAN_SHARD_MODE definido)", file=sys.stderr)
+        return 1
+    sharded = ShardedDatabase(args.shard_dir, args.mode, args.buckets)
+    copied = split_into_shards(database, sharded)
+    print(f"{copied} projetos copiados para {args.shard_dir} ({len(sharded.shard_names())} shards)")
+    print("Para usar: KANBAN_SHARD_MODE={} KANBAN_SHARD_DIR={}{}".format(
+        args.mode, args.shard_dir, f" KANBAN_SHARD_BUCKETS={args.buckets}" if args.mode == 'hash' else ""
+    ))
+    return 0
+
+# =============================================================================
+# FLUXO PRINCIPAL
+# =============================================================================
+
+def build_parser():
+    """Define comandos e argumentos"""
+    parser = argparse.ArgumentParser(description="Administração em lote do Kanban App!")
+    parser.add_argument('--db', default=DB_PATH,
+                        help="Arquivo do banco SQLite (ignorado com KANBAN_SHARD_MODE definido)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_selection(sub):
+        group = sub.add_mutually_exclusive_group(required=True)
+        group.add_argument('--project', action='append', help="Código do projeto (pode repetir)")
+        group.add_argument('--all', action='store_true', help="Todos os projetos")
+
+    sub = subparsers.add_parser('projects', help="Lista projetos")
+    sub.set_defaults(func=cmd_projects)
+
+    sub = subparsers.add_parser('create', help="Cria projetos")
+    sub.add_argument('--admin', required=True, help="Nome do administrador")
+    sub.add_argument('--title', default="Meu Projeto Kanban")
+    sub.add_argument('--count', type=int, default=1, help="Quantidade de projetos")
+    sub.set_defaults(func=cmd_create)
+
+    sub = subparsers.add_parser('move', help="Move tarefas entre colunas")
+    add_selection(sub)
+    sub.add_argument('--from', dest='from_column', required=True, choices=COLUMNS)
+    sub.add_argument('--to', dest='to_column', required=True, choices=COLUMNS)
+    sub.set_defaults(func=cmd_move)
+
+    sub = subparsers.add_parser('purge', help="Remove projetos antigos")
+    sub.add_argument('--older-than', type=float, required=True, help="Idade mínima em dias")
+    sub.add_argument('--dry-run', action='store_true', help="Apenas lista o que seria removido")
+    sub.set_defaults(func=cmd_purge)
+
+    sub = subparsers.add_parser('archive', help="Arquiva (exporta e remove) projetos inativos")
+    sub.add_argument('--inactive-for', type=float, required=True, help="Dias sem acesso")
+    sub.add_argument('--out', default="archive", help="Pasta dos arquivos JSON")
+    sub.add_argument('--dry-run', action='store_true', help="Apenas lista o que seria arquivado")
+    sub.set_defaults(func=cmd_archive)
+
+    sub = subparsers.add_parser('export', help="Exporta projetos para JSON")
+    add_selection(sub)
+    sub.add_argument('--out', default="exports", help="Pasta de destino")
+    sub.add_argument('--workers', type=int, default=4, help="Exportações em paralelo")
+    sub.set_defaults(func=cmd_export)
+
+    sub = subparsers.add_parser('import', help="Importa arquivos JSON")
+    sub.add_argument('files', nargs='+')
+    sub.set_defaults(func=cmd_import)
+
+    sub = subparsers.add_parser('backup', help="Gera backup online do banco")
+    sub.add_argument('--dir', default=BACKUP_DIR)
+    sub.set_defaults(func=cmd_backup)
+
+    sub = subparsers.add_parser('backups', help="Lista backups")
+    sub.add_argument('--dir', default=BACKUP_DIR)
+    sub.set_defaults(func=cmd_backups)
+
+    sub = subparsers.add_parser('restore-backup', help="Restaura o banco a partir de um backup")
+    sub.add_argument('file')
+    sub.set_defaults(func=cmd_restore_backup)
+
+    sub = subparsers.add_parser('snapshots', help="Lista snapshots de um projeto")
+    sub.add_argument('project_code')
+    sub.set_defaults(func=cmd_snapshots)
+
+    sub = subparsers.add_parser('restore-snapshot', help="Restaura projeto a partir de um snapshot")
+    sub.add_argument('project_code')
+    sub.add_argument('snapshot_id', type=int)
+    sub.set_defaults(func=cmd_restore_snapshot)
+
+    sub = subparsers.add_parser('prune-snapshots', help="Remove snapshots antigos de todos os projetos")
+    sub.add_argument('--max-age-days', type=float, default=SNAPSHOT_MAX_AGE_DAYS, help="Idade máxima em dias")
+    sub.set_defaults(func=cmd_prune_snapshots)
+
+    sub = subparsers.add_parser('split', help="Divide o banco de arquivo único em shards")
+    sub.add_argument('--shard-dir', default=SHARD_DIR, help="Pasta de destino dos shards")
+    sub.add_argument('--mode', choices=['project', 'hash'], default='project',
+                     help="Um arquivo por projeto ou grupos por hash do código")
+    sub.add_argument('--buckets', type=int, default=SHARD_BUCKETS, help="Quantidade de shards no modo hash")
+    sub.set_defaults(func=cmd_split)
+
+    return parser
+
+def main(argv=None):
+    """Executa o comando solicitado"""
+    args = build_parser().parse_args(argv)
+    database = open_database(args.db)
+    return args.func(database, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
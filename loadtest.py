@@ -0,0 +1,385 @@
+"""Teste de carga com várias sessões simultâneas do Kanban App!
+
+Cada sessão simulada é um AppTest do Streamlit executando o `app.py` de
+verdade contra um banco temporário: entra no mesmo projeto e executa uma
+mistura de ações (criar, mover, editar, atualizar, exportar PDF). Ao final
+são exibidos percentis de latência por ação, erros de lock do SQLite e
+atualizações perdidas (tarefas criadas ou edições que não estão no banco).
+
+O AppTest troca o singleton global do Runtime a cada execução, então não
+pode rodar em várias threads do mesmo processo; cada sessão roda em um
+processo próprio. Caches por processo do app (limitador, telemetria) não
+são compartilhados entre sessões, mas o banco SQLite é.
+
+Ao final, um processo com duas sessões verifica o descarte de estado de
+sessões ociosas: a sessão parada perde tarefas e metadados quando a outra
+faz a varredura (conferido no painel de desempenho do admin) e os
+recarrega do banco ao voltar.
+
+Uso:
+    python loadtest.py --sessions 8 --actions 25
+    python loadtest.py --sessions 20 --actions 50 --mix create=4,move=3,edit=2,refresh=2,export=1
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+APP_FILE = Path(__file__).resolve().parent / "app.py"
+COLUMNS = ['Backlog', 'Análise', 'Desenvolvimento', 'Testes', 'Pronto']
+DEFAULT_MIX = "create=4,move=3,edit=2,refresh=2,export=1"
+# Tempo para todos os processos importarem o Streamlit antes da largada
+WARMUP_SECONDS = 5
+# Ociosidade usada na verificação de descarte de sessões
+EVICTION_IDLE_SECONDS = 1
+
+# =============================================================================
+# RESULTADOS
+# =============================================================================
+
+class LoadTestResults:
+    """Latências e falhas coletadas por uma ou mais sessões"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.error_samples = []
+        self.lock_errors = 0
+        self.created_ids = set()
+        # task_id -> (instante da gravação, conteúdo esperado)
+        self.last_edits = {}
+
+    def record(self, action, seconds, error_messages):
+        self.latencies.setdefault(action, []).append(seconds)
+        if error_messages:
+            self.errors[action] = self.errors.get(action, 0) + 1
+            self.lock_errors += sum(1 for msg in error_messages if 'locked' in msg.lower())
+            if len(self.error_samples) < 5:
+                self.error_samples.append(f"{action}: {error_messages[0]}")
+
+    def record_created(self, task_id):
+        self.created_ids.add(task_id)
+
+    def record_edit(self, task_id, content, finished_at):
+        previous = self.last_edits.get(task_id)
+        if previous is None or previous[0] < finished_at:
+            self.last_edits[task_id] = (finished_at, content)
+
+    def to_dict(self):
+        """Dados simples para enviar entre processos"""
+        return dict(vars(self))
+
+    def merge(self, data):
+        """Acumula resultados de outra sessão (recebidos via to_dict)"""
+        other = LoadTestResults()
+        vars(other).update(data)
+        for action, values in other.latencies.items():
+            self.latencies.setdefault(action, []).extend(values)
+        for action, count in other.errors.items():
+            self.errors[action] = self.errors.get(action, 0) + count
+        self.error_samples.extend(other.error_samples[:max(0, 10 - len(self.error_samples))])
+        self.lock_errors += other.lock_errors
+        self.created_ids |= other.created_ids
+        for task_id, (finished_at, content) in other.last_edits.items():
+            self.record_edit(task_id, content, finished_at)
+
+# =============================================================================
+# SESSÃO SIMULADA
+# =============================================================================
+
+def share_script_cache():
+    """Faz as execuções do AppTest reutilizarem o bytecode compilado do app.
+    
+    O AppTest cria um ScriptCache novo a cada run e recompila o script,
+    enquanto o servidor real compila uma vez; sem isso a compilação entraria
+    na latência medida de cada ação.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    shared_cache = ScriptCache()
+    app_test.ScriptCache = lambda: shared_cache
+    local_script_runner.ScriptCache = lambda: shared_cache
+
+class SimulatedSession:
+    """Uma aba de navegador dirigida pelo AppTest"""
+
+    def __init__(self, name, results, rng, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.name = name
+        self.results = results
+        self.rng = rng
+        self.at = AppTest.from_file(str(APP_FILE), default_timeout=timeout)
+
+    def _errors(self):
+        messages = [e.value for e in self.at.error]
+        messages += [e.message for e in self.at.exception]
+        return messages
+
+    def timed(self, action, steps):
+        """Executa os passos da ação medindo o tempo total"""
+        start = time.perf_counter()
+        try:
+            steps()
+            errors = self._errors()
+        except Exception as e:
+            errors = [f"{type(e).__name__}: {e}"]
+        elapsed = time.perf_counter() - start
+        self.results.record(action, elapsed, errors)
+        return not errors
+
+    def _button(self, label=None, key=None):
+        for button in self.at.button:
+            if (key is not None and button.key == key) or (label is not None and button.label == label):
+                return button
+        raise LookupError(f"botão não encontrado: {label or key}")
+
+    def _text_input(self, label):
+        return next(w for w in self.at.text_input if w.label == label)
+
+    def _tasks(self):
+        """Tarefas no quadro: id e coluna vêm do seletor de mover; editáveis têm botão de editar"""
+        editable = {b.key[len('edit_'):] for b in self.at.button if (b.key or '').startswith('edit_')}
+        tasks = []
+        for select in self.at.selectbox:
+            if (select.key or '').startswith('move_'):
+                task_id = select.key[len('move_'):]
+                # O seletor lista todas as colunas menos a atual
+                column = next(c for c in COLUMNS if c not in select.options)
+                tasks.append({'id': task_id, 'column': column, 'editable': task_id in editable})
+        return tasks
+
+    def admin_login(self):
+        """Entra com a senha de admin (libera o painel de desempenho)"""
+        self._button(key="admin_btn").click().run()
+        next(w for w in self.at.text_input if w.key == "admin_pwd").input(os.getenv('ADMIN_PASSWORD', 'admin123'))
+        self._button(label="Entrar como Admin").click().run()
+
+    def evictions(self):
+        """Descartes de sessões ociosas informados no painel de desempenho"""
+        for caption in self.at.sidebar.caption:
+            match = re.search(r"descartes: (\d+)", caption.value)
+            if match:
+                return int(match.group(1))
+        return 0
+
+    def create_project(self):
+        """Cria o projeto compartilhado e retorna o código"""
+        self.at.run()
+
+        def steps():
+            self._text_input("Seu nome (Administrador)").input(self.name)
+            self._button(label="✨ Criar Projeto").click().run()
+
+        self.timed('login', steps)
+        return self.at.session_state['project_code']
+
+    def login(self, project_code):
+        self.at.run()
+
+        def steps():
+            self._text_input("Código do projeto (8 dígitos)").input(project_code)
+            self._text_input("Seu nome").input(self.name)
+            self._button(label="🚀 Entrar no Projeto").click().run()
+
+        self.timed('login', steps)
+
+    def create(self):
+        column = self.rng.choice(COLUMNS)
+        before = {t['id'] for t in self._tasks()}
+
+        def steps():
+            self._button(key=f"new_{column}").click().run()
+            self.at.text_area[0].input(f"{self.name} {uuid.uuid4().hex[:6]}")
+            self._button(label="✅ Criar").click().run()
+
+        if self.timed('create', steps):
+            for task in self._tasks():
+                if task['id'] not in before:
+                    self.results.record_created(task['id'])
+
+    def move(self):
+        tasks = self._tasks()
+        if not tasks:
+            return self.refresh()
+        task = self.rng.choice(tasks)
+        dest = self.rng.choice([c for c in COLUMNS if c != task['column']])
+
+        self.timed('move', lambda: self.at.selectbox(key=f"move_{task['id']}").set_value(dest).run())
+
+    def edit(self):
+        tasks = [t for t in self._tasks() if t['editable']]
+        if not tasks:
+            return self.create()
+        task = self.rng.choice(tasks)
+        content = f"{self.name} editou {uuid.uuid4().hex[:6]}"
+
+        def steps():
+            self._button(key=f"edit_{task['id']}").click().run()
+            self.at.text_area[0].input(content)
+            self._button(label="💾 Salvar").click().run()
+
+        if self.timed('edit', steps):
+            self.results.record_edit(task['id'], content, time.time())
+
+    def refresh(self):
+        self.timed('refresh', lambda: self._button(key="refresh_btn").click().run())
+
+    def export(self):
+        self.timed('export', lambda: self._button(label="📄 Exportar PDF").click().run())
+
+def create_shared_project(timeout):
+    """Processo que cria o projeto usado por todas as sessões"""
+    share_script_cache()
+    results = LoadTestResults()
+    session = SimulatedSession("admin", results, random.Random(), timeout)
+    return session.create_project(), results.to_dict()
+
+def check_idle_eviction(project_code, timeout):
+    """Processo com duas sessões: a ociosa deve ser descartada e recarregada do banco"""
+    os.environ.update(KANBAN_SESSION_IDLE_SECONDS=str(EVICTION_IDLE_SECONDS), KANBAN_SESSION_SWEEP_INTERVAL='0')
+    share_script_cache()
+    results = LoadTestResults()
+    idle = SimulatedSession("ocioso", results, random.Random(), timeout)
+    active = SimulatedSession("ativo", results, random.Random(), timeout)
+
+    idle.login(project_code)
+    task_count = len(idle._tasks())
+    active.login(project_code)
+    active.admin_login()
+    time.sleep(EVICTION_IDLE_SECONDS + 0.5)
+    # A varredura roda ao fim do rerun; o painel mostra o resultado no seguinte
+    active.refresh()
+    active.at.run()
+    evicted = active.evictions() >= 1
+
+    idle.at.run()
+    rehydrated = not idle.at.exception and len(idle._tasks()) == task_count
+    return {'evicted': evicted, 'rehydrated': rehydrated, 'tasks': task_count}
+
+def run_session(name, project_code, actions, mix, think_time, seed, timeout, start_at):
+    """Processo de uma sessão: espera a largada, entra no projeto e executa as ações"""
+    share_script_cache()
+    results = LoadTestResults()
+    session = SimulatedSession(name, results, random.Random(seed), timeout)
+
+    time.sleep(max(0.0, start_at - time.time()))
+    session.login(project_code)
+    names, weights = zip(*mix.items())
+    for _ in range(actions):
+        getattr(session, session.rng.choices(names, weights)[0])()
+        if think_time:
+            time.sleep(session.rng.uniform(0, think_time))
+    return results.to_dict()
+
+# =============================================================================
+# RELATÓRIO
+# =============================================================================
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def print_report(results, db_path, wall_time):
+    """Imprime latências por ação e verifica atualizações perdidas no banco"""
+    from app import Database
+
+    print(f"\n{'Ação':<10}{'n':>6}{'erros':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+    for action, values in sorted(results.latencies.items()):
+        ordered = sorted(v * 1000 for v in values)
+        print(f"{action:<10}{len(ordered):>6}{results.errors.get(action, 0):>7}"
+              f"{statistics.median(ordered):>10.1f}{percentile(ordered, 0.95):>10.1f}"
+              f"{percentile(ordered, 0.99):>10.1f}{ordered[-1]:>10.1f}")
+
+    final_tasks = {}
+    database = Database(db_path)
+    for project in database.list_projects():
+        for task in database.load_tasks(project['code']):
+            final_tasks[task['id']] = task
+
+    lost_creates = len(results.created_ids - final_tasks.keys())
+    lost_edits = sum(
+        1 for task_id, (_, content) in results.last_edits.items()
+        if task_id in final_tasks and final_tasks[task_id]['content'] != content
+    )
+
+    total_actions = sum(len(v) for v in results.latencies.values())
+    print(f"\nDuração: {wall_time:.1f} s ({total_actions / wall_time:.1f} ações/s)")
+    print(f"Erros de lock do SQLite: {results.lock_errors}")
+    print(f"Tarefas criadas perdidas: {lost_creates} de {len(results.created_ids)}")
+    print(f"Edições perdidas: {lost_edits} de {len(results.last_edits)}")
+    if results.error_samples:
+        print("\nExemplos de erros:")
+        for sample in results.error_samples:
+            print(f"  {sample}")
+
+# =============================================================================
+# FLUXO PRINCIPAL
+# =============================================================================
+
+def parse_mix(text):
+    """Converte 'create=4,move=3' em {'create': 4.0, 'move': 3.0}"""
+    mix = {}
+    for item in text.split(','):
+        name, weight = item.split('=')
+        if name not in ('create', 'move', 'edit', 'refresh', 'export'):
+            raise argparse.ArgumentTypeError(f"ação desconhecida: {name}")
+        mix[name] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga multi-sessão do Kanban App!")
+    parser.add_argument('--sessions', type=int, default=8, help="Sessões simultâneas")
+    parser.add_argument('--actions', type=int, default=25, help="Ações por sessão")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help="Pesos das ações")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Pausa máxima entre ações (s)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=60, help="Tempo máximo de cada rerun (s)")
+    parser.add_argument('--keep-limits', action='store_true',
+                        help="Mantém os limites de taxa do app (por padrão são desativados)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "loadtest.db")
+        os.environ['KANBAN_DB_PATH'] = db_path
+        os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+        if not args.keep_limits:
+            for name in ('SESSION', 'PROJECT', 'HEAVY_SESSION', 'HEAVY_PROJECT'):
+                os.environ[f'KANBAN_{name}_RATE'] = '1000000'
+                os.environ[f'KANBAN_{name}_BURST'] = '1000000'
+
+        rng = random.Random(args.seed)
+        results = LoadTestResults()
+        context = multiprocessing.get_context("spawn")
+
+        # O AppTest substitui o módulo __main__ do processo; cada processo atende uma única tarefa
+        with ProcessPoolExecutor(max_workers=args.sessions, mp_context=context, max_tasks_per_child=1) as executor:
+            project_code, setup_results = executor.submit(create_shared_project, args.timeout).result()
+            results.merge(setup_results)
+
+            start_at = time.time() + WARMUP_SECONDS
+            futures = [
+                executor.submit(run_session, f"user{i}", project_code, args.actions, args.mix,
+                                args.think_time, rng.random(), args.timeout, start_at)
+                for i in range(args.sessions)
+            ]
+            for future in futures:
+                results.merge(future.result())
+            wall_time = time.time() - start_at
+
+            eviction = executor.submit(check_idle_eviction, project_code, args.timeout).result()
+
+        print_report(results, db_path, wall_time)
+        print(f"Sessão ociosa descartada: {'sim' if eviction['evicted'] else 'NÃO'}; "
+              f"recarregada do banco ({eviction['tasks']} tarefas): {'sim' if eviction['rehydrated'] else 'NÃO'}")
+
+if __name__ == "__main__":
+    main()